@@ -3,31 +3,125 @@
 # Not production. Intended as a clean nucleus.
 
 import argparse
+import contextlib
 import dataclasses
 import hashlib
 import json
+import operator
 import os
+import random
+import struct
 import time
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+# Optional C JSON encoder for the hashing hot path
+try:
+    import orjson  # type: ignore
+
+    HAS_ORJSON = True
+except Exception:  # pragma: no cover - optional dependency
+    HAS_ORJSON = False
 
 
 # ----------------------------
 # Utilities
 # ----------------------------
 
+# bound once: every hash below goes through OpenSSL's sha256, which already
+# dispatches to SHA-NI / AVX2 transforms where the CPU has them
+_sha256 = hashlib.sha256
+
 def sha256(b: bytes) -> bytes:
-    return hashlib.sha256(b).digest()
+    return _sha256(b).digest()
 
 def hash_hex(b: bytes) -> str:
-    return hashlib.sha256(b).hexdigest()
+    return _sha256(b).hexdigest()
 
 def now_ts() -> int:
     return int(time.time())
 
+# Tx nonces only keep otherwise-identical txs from colliding on txid; they are
+# not secrets, so a urandom-seeded PRNG replaces a getrandom syscall per tx.
+_nonce_rng = random.Random(os.urandom(32))
+if hasattr(os, "register_at_fork"):
+    # forked workers must not replay the parent's nonce sequence
+    os.register_at_fork(after_in_child=lambda: _nonce_rng.seed(os.urandom(32)))
+
+def tx_nonce() -> int:
+    return _nonce_rng.getrandbits(32)
+
+def json_loads(b: bytes) -> Any:
+    if HAS_ORJSON:
+        try:
+            return orjson.loads(b)
+        except ValueError:  # e.g. ints wider than 64 bits; let json decide
+            pass
+    return json.loads(b)
+
+def _has_float(obj: Any) -> bool:
+    t = type(obj)
+    if t is float:
+        return True
+    if t is dict:
+        return any(map(_has_float, obj.values()))
+    if t is list or t is tuple:
+        return any(map(_has_float, obj))
+    return False
+
 def canonical_json(obj: Any) -> bytes:
+    if HAS_ORJSON and not _has_float(obj):
+        # orjson writes raw UTF-8 and its own escape forms, so its output is
+        # only used when it is plain ASCII with nothing escaped; for int/str
+        # values it is then byte-identical to the stdlib encoding below, and
+        # hashes agree with or without orjson installed. Floats always take
+        # the stdlib path: orjson spells them differently (1e-05 vs 0.00001,
+        # NaN as null).
+        try:
+            out = orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+        except TypeError:  # e.g. ints wider than 64 bits
+            out = b""
+        if out and out.isascii() and b"\\" not in out:
+            return out
     return json.dumps(obj, sort_keys=True, separators=(",", ":")).encode("utf-8")
 
 
+# ----------------------------
+# Binary hashing encoding
+# ----------------------------
+
+# Transactions and headers at version >= 2 are hashed over a fixed
+# little-endian binary encoding (ser()) instead of canonical JSON: no key
+# sorting, int formatting or escaping on the hash path. Version 1 objects keep
+# hashing canonical JSON so existing chains still verify. JSON remains the
+# on-disk format for both.
+TX_VERSION = 2
+HEADER_VERSION = 2
+
+_U32 = struct.Struct("<I")
+_I64 = struct.Struct("<q")
+_U64 = struct.Struct("<Q")
+# version, prev_hash, merkle_root, timestamp, height, bits; the u64 nonce
+# follows last so miners can hash this prefix once
+_HDR_PREFIX = struct.Struct("<I32s32sqQI")
+# value ranges of those fields; validation rejects anything the binary
+# encoding cannot hold before it is hashed
+_I64_MAX = 2**63 - 1
+_U64_MAX = 2**64 - 1
+
+def _ser_str(s: str) -> bytes:
+    b = s.encode("utf-8")
+    return _U32.pack(len(b)) + b
+
+def _is_hash32(h: Any) -> bool:
+    # 64 hex chars decoding to exactly 32 bytes, as the 32s header fields expect
+    if not isinstance(h, str) or len(h) != 64:
+        return False
+    try:
+        return len(bytes.fromhex(h)) == 32
+    except ValueError:
+        return False
+
+
 # ----------------------------
 # Transaction (simple account model)
 # ----------------------------
@@ -56,15 +150,38 @@ class Transaction:
     def to_dict(self) -> Dict[str, Any]:
         return {
             "version": self.version,
-            "vin": [dataclasses.asdict(i) for i in self.vin],
-            "vout": [dataclasses.asdict(o) for o in self.vout],
+            "vin": [{"from_addr": i.from_addr, "sig": i.sig} for i in self.vin],
+            "vout": [{"to_addr": o.to_addr, "amount": o.amount} for o in self.vout],
             "fee": self.fee,
             "nonce": self.nonce,
             "memo": self.memo,
         }
 
+    def ser(self) -> bytes:
+        parts = [_U32.pack(self.version), _U32.pack(len(self.vin))]
+        for i in self.vin:
+            parts.append(_ser_str(i.from_addr))
+            parts.append(_ser_str(i.sig))
+        parts.append(_U32.pack(len(self.vout)))
+        for o in self.vout:
+            parts.append(_ser_str(o.to_addr))
+            parts.append(_I64.pack(o.amount))
+        parts.append(_I64.pack(self.fee))
+        parts.append(_U64.pack(self.nonce))
+        parts.append(_ser_str(self.memo))
+        return b"".join(parts)
+
     def txid(self) -> str:
-        return hash_hex(canonical_json(self.to_dict()))
+        # frozen, so the id is computed once and memoized on the instance
+        # (vin/vout lists must not be mutated after construction)
+        h = self.__dict__.get("_txid")
+        if h is None:
+            if self.version >= 2:
+                h = hash_hex(self.ser())
+            else:
+                h = hash_hex(canonical_json(self.to_dict()))
+            object.__setattr__(self, "_txid", h)
+        return h
 
 
 # ----------------------------
@@ -82,10 +199,56 @@ class BlockHeader:
     nonce: int
 
     def to_dict(self) -> Dict[str, Any]:
-        return dataclasses.asdict(self)
+        return {
+            "version": self.version,
+            "prev_hash": self.prev_hash,
+            "merkle_root": self.merkle_root,
+            "timestamp": self.timestamp,
+            "height": self.height,
+            "bits": self.bits,
+            "nonce": self.nonce,
+        }
+
+    def _ser_prefix(self) -> bytes:
+        return _HDR_PREFIX.pack(
+            self.version, bytes.fromhex(self.prev_hash), bytes.fromhex(self.merkle_root),
+            self.timestamp, self.height, self.bits,
+        )
+
+    def ser(self) -> bytes:
+        return self._ser_prefix() + _U64.pack(self.nonce)
 
     def hash(self) -> str:
-        return hash_hex(canonical_json(self.to_dict()))
+        h = self.__dict__.get("_hash")
+        if h is None:
+            if self.version >= 2:
+                h = hash_hex(self.ser())
+            else:
+                h = hash_hex(canonical_json(self.to_dict()))
+            object.__setattr__(self, "_hash", h)
+        return h
+
+    def nonce_encoder(self) -> Callable[[int], bytes]:
+        # how the nonce appears inside the hashed encoding
+        if self.version >= 2:
+            return _U64.pack
+        return b"%d".__mod__
+
+    def nonce_split(self) -> Tuple[bytes, bytes]:
+        """
+        Split the hashed encoding around the nonce: prefix + encode(n) + suffix,
+        with encode = nonce_encoder(), is exactly what hash() digests for any
+        nonce n. Lets the miner hash the fixed prefix once and only feed the
+        varying tail per attempt.
+        """
+        if self.version >= 2:
+            return self._ser_prefix(), b""
+        d = self.to_dict()
+        d["nonce"] = 0
+        raw = canonical_json(d)
+        marker = b'"nonce":0'
+        i = raw.index(marker) + len(marker) - 1
+        return raw[:i], raw[i + 1:]
 
 @dataclasses.dataclass(frozen=True)
 class Block:
@@ -101,19 +264,107 @@ class Block:
     def block_hash(self) -> str:
         return self.header.hash()
 
+    def merkle(self) -> str:
+        """
+        merkle_root over self.txs, memoized together with the exact tx objects
+        it covered: the root a template was built with is reused when the mined
+        block is verified, while a txs list edited in between is recomputed.
+        """
+        txs = tuple(self.txs)
+        memo = self.__dict__.get("_merkle")
+        if memo is not None and len(memo[0]) == len(txs) and all(map(operator.is_, memo[0], txs)):
+            return memo[1]
+        root = merkle_root([t.txid() for t in txs])
+        object.__setattr__(self, "_merkle", (txs, root))
+        return root
+
+    def _remember_merkle(self, root: str):
+        # for callers that already computed the root over the current txs
+        object.__setattr__(self, "_merkle", (tuple(self.txs), root))
+
+    def with_header(self, header: BlockHeader) -> "Block":
+        blk = Block(header=header, txs=self.txs)
+        memo = self.__dict__.get("_merkle")
+        if memo is not None:
+            object.__setattr__(blk, "_merkle", memo)
+        return blk
+
+
+_amount_of = operator.attrgetter("amount")
+
+
+def pow_target(bits: int) -> bytes:
+    """
+    32-byte big-endian bound for "at least `bits` leading zero hex digits":
+    a raw digest meets it iff digest < pow_target(bits). bytes compare
+    lexicographically, which is numeric order for equal-length big-endian,
+    so the check is one C-level compare with no hex formatting.
+    """
+    if bits <= 0:
+        return b"\xff" * 33  # sorts above every 32-byte digest
+    if bits > 64:
+        return bytes(32)  # no digest is below zero
+    return (1 << (256 - 4 * bits)).to_bytes(32, "big")
+
+
+def block_from_dict(obj: Dict[str, Any]) -> Block:
+    txs = []
+    for t in obj["txs"]:
+        txs.append(Transaction(
+            version=t["version"],
+            vin=[TxIn(i["from_addr"], i.get("sig", "")) for i in t["vin"]],
+            vout=[TxOut(o["to_addr"], o["amount"]) for o in t["vout"]],
+            fee=t["fee"], nonce=t["nonce"], memo=t.get("memo", ""),
+        ))
+    return Block(header=BlockHeader(**obj["header"]), txs=txs)
+
+
+_EMPTY_MERKLE = hash_hex(b"")
+
 
 def merkle_root(txids: List[str]) -> str:
+    # Protocol: no leaves -> sha256(b""); one leaf -> that txid itself (a lone
+    # node is never paired); odd layers duplicate their last node.
     if not txids:
-        return hash_hex(b"")
-    layer = [bytes.fromhex(t) for t in txids]
-    while len(layer) > 1:
-        if len(layer) % 2 == 1:
-            layer.append(layer[-1])
-        nxt = []
-        for i in range(0, len(layer), 2):
-            nxt.append(sha256(layer[i] + layer[i + 1]))
-        layer = nxt
-    return layer[0].hex()
+        return _EMPTY_MERKLE
+    if len(txids) == 1:
+        return txids[0]
+    # each layer is one flat buffer of 32-byte nodes; pairs are hashed as
+    # 64-byte slices of it, so there is no per-pair concatenation or list
+    sha = _sha256
+    buf = bytes.fromhex("".join(txids))
+    n = len(txids)
+    while n > 1:
+        if n % 2 == 1:
+            buf += buf[-32:]
+            n += 1
+        buf = b"".join([sha(buf[i:i + 64]).digest() for i in range(0, n * 32, 64)])
+        n //= 2
+    return buf.hex()
+
+
+# state.log records appended before ChainDB folds them into a state.json snapshot
+STATE_SNAPSHOT_INTERVAL = 1000
+
+# nonces scanned per find_nonce() call by ChainDB._mine_block
+NONCE_BATCH = 1 << 20
+
+
+def find_nonce(mid: Any, encode: Callable[[int], bytes], suffix: bytes,
+               target: bytes, start: int, stop: int) -> Optional[int]:
+    """
+    Search nonces in [start, stop) for the first whose header digest is below
+    target. mid is a hashlib sha256 object already fed the header prefix, and
+    encode/suffix come from BlockHeader.nonce_encoder()/nonce_split(). Kept
+    free of ChainDB so a range can be handed to any worker.
+    """
+    copy = mid.copy
+    for nonce in range(start, stop):
+        h = copy()
+        h.update(encode(nonce) + suffix)
+        if h.digest() < target:
+            return nonce
+    return None
 
 
 # ----------------------------
@@ -137,11 +388,17 @@ class IssuancePolicy:
         self.lr = 1e-4
 
     def predict(self, miners: int, nodes: int, tx_count: int, mempool_size: int, fee_pressure: float) -> int:
-        x = [float(miners), float(nodes), float(tx_count), float(mempool_size), float(fee_pressure)]
-        s = self.base
-        for wi, xi in zip(self.w, x):
-            s += wi * xi
-        s = int(round(s))
+        w = self.w
+        if not any(w):
+            # untrained (the default): every weighted term is 0.0
+            s = self.base
+        else:
+            # unrolled left to right, i.e. the same float summation order as
+            # accumulating term by term, without building a feature list
+            s = int(round(
+                self.base + w[0] * float(miners) + w[1] * float(nodes) + w[2] * float(tx_count)
+                + w[3] * float(mempool_size) + w[4] * float(fee_pressure)
+            ))
         if s < self.min:
             s = self.min
         if s > self.max:
@@ -169,10 +426,22 @@ class ChainDB:
         os.makedirs(self.path, exist_ok=True)
         self.blocks_path = os.path.join(self.path, "blocks.jsonl")
         self.state_path = os.path.join(self.path, "state.json")
+        # per-block balance deltas since the state.json snapshot
+        self.state_log_path = os.path.join(self.path, "state.log")
 
         self.blocks: List[Block] = []
         self.balances: Dict[str, int] = {}
         self.mempool: Dict[str, Transaction] = {}
+        # per-sender outputs+fees already committed by mempool txs, so
+        # admission is one subtract instead of a mempool scan
+        self.pending_spend: Dict[str, int] = {}
+        # serialized block lines held back while inside batch()
+        self._pending_blocks: Optional[List[str]] = None
+        # (addr, previous balance or None) undo records while applying a block
+        self._journal: Optional[List[Tuple[str, Optional[int]]]] = None
+        # addresses changed since the last _persist_state
+        self._dirty: Set[str] = set()
+        self._log_records = 0
 
         self.bits = 5  # leading hex zeros requirement; simplistic
         self.target_block_time = 60  # seconds
@@ -190,38 +459,81 @@ class ChainDB:
 
     def _load(self):
         if os.path.exists(self.blocks_path):
-            with open(self.blocks_path, "r", encoding="utf-8") as f:
-                for line in f:
-                    obj = json.loads(line)
-                    hdr = BlockHeader(**obj["header"])
-                    txs = []
-                    for t in obj["txs"]:
-                        vin = [TxIn(**i) for i in t["vin"]]
-                        vout = [TxOut(**o) for o in t["vout"]]
-                        txs.append(Transaction(
-                            version=t["version"], vin=vin, vout=vout,
-                            fee=t["fee"], nonce=t["nonce"], memo=t.get("memo", "")
-                        ))
-                    self.blocks.append(Block(header=hdr, txs=txs))
+            # one read + C-level line split, then one parser call per line
+            with open(self.blocks_path, "rb") as f:
+                lines = f.read().splitlines()
+            self.blocks = [block_from_dict(json_loads(ln)) for ln in lines if ln.strip()]
 
+        snap_height = -1
         if os.path.exists(self.state_path):
             with open(self.state_path, "r", encoding="utf-8") as f:
                 st = json.loads(f.read())
                 self.balances = {k: int(v) for k, v in st.get("balances", {}).items()}
                 self.bits = int(st.get("bits", self.bits))
+                snap_height = int(st.get("height", -1))
+
+        if os.path.exists(self.state_log_path):
+            with open(self.state_log_path, "r+b") as f:
+                data = f.read()
+                end = data.rfind(b"\n") + 1
+                if end < len(data):
+                    # torn tail from an interrupted append: cut it so the next
+                    # append starts a fresh line instead of extending it
+                    f.truncate(end)
+            for line in data[:end].splitlines():
+                try:
+                    rec = json_loads(line)
+                except ValueError:
+                    continue  # record garbled by an older torn append
+                self._log_records += 1
+                if int(rec["h"]) <= snap_height:
+                    continue  # already folded into the snapshot
+                for k, v in rec["d"].items():
+                    self.balances[k] = int(v)
+                self.bits = int(rec.get("bits", self.bits))
 
     def _persist_block(self, blk: Block):
+        line = json.dumps(blk.to_dict(), sort_keys=True) + "\n"
+        if self._pending_blocks is not None:
+            self._pending_blocks.append(line)
+            return
         with open(self.blocks_path, "a", encoding="utf-8") as f:
-            f.write(json.dumps(blk.to_dict(), sort_keys=True) + "\n")
+            f.write(line)
 
     def _persist_state(self):
-        st = {"balances": self.balances, "bits": self.bits}
-        with open(self.state_path, "w", encoding="utf-8") as f:
-            f.write(json.dumps(st, sort_keys=True, indent=2))
+        """
+        Append the balances touched since the last call to state.log; every
+        STATE_SNAPSHOT_INTERVAL records (or when there is no snapshot yet)
+        rewrite state.json in full and truncate the log instead. Per-block
+        cost is O(touched addresses) rather than O(all balances).
+        """
+        if self._pending_blocks is not None:
+            return  # written once when the batch closes
+        if self._log_records >= STATE_SNAPSHOT_INTERVAL or not os.path.exists(self.state_path):
+            self._snapshot_state()
+            return
+        delta = {a: self.balances[a] for a in sorted(self._dirty) if a in self.balances}
+        rec = {"h": self.height(), "bits": self.bits, "d": delta}
+        with open(self.state_log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(rec, separators=(",", ":")) + "\n")
+        self._log_records += 1
+        self._dirty.clear()
+
+    def _snapshot_state(self):
+        st = {"balances": self.balances, "bits": self.bits, "height": self.height()}
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps(st, sort_keys=True, separators=(",", ":")))
+        os.replace(tmp, self.state_path)
+        # the snapshot's height makes any stale log lines skip on replay,
+        # so truncating after the replace is crash-safe
+        open(self.state_log_path, "w", encoding="utf-8").close()
+        self._log_records = 0
+        self._dirty.clear()
 
     def _genesis(self):
         coinbase = Transaction(
-            version=1,
+            version=TX_VERSION,
             vin=[TxIn(from_addr="COINBASE")],
             vout=[TxOut(to_addr="genesis", amount=100_000_000_000)],
             fee=0,
@@ -231,7 +543,7 @@ class ChainDB:
         txids = [coinbase.txid()]
         mr = merkle_root(txids)
         hdr = BlockHeader(
-            version=1,
+            version=HEADER_VERSION,
             prev_hash="00" * 32,
             merkle_root=mr,
             timestamp=now_ts(),
@@ -247,6 +559,27 @@ class ChainDB:
         self._persist_block(blk)
         self._persist_state()
 
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Coalesce persistence for blocks submitted inside the with-block (sync,
+        catch-up, bulk mining): one append of all block lines to blocks.jsonl
+        and one state write on exit, instead of an open/write per block plus a
+        full state rewrite per block. Nested batches join the outer one.
+        """
+        if self._pending_blocks is not None:
+            yield self
+            return
+        self._pending_blocks = []
+        try:
+            yield self
+        finally:
+            pending, self._pending_blocks = self._pending_blocks, None
+            if pending:
+                with open(self.blocks_path, "a", encoding="utf-8") as f:
+                    f.write("".join(pending))
+                self._persist_state()
+
     def tip(self) -> Block:
         return self.blocks[-1]
 
@@ -258,19 +591,24 @@ class ChainDB:
     # ----------------------------
 
     def _check_pow(self, hdr: BlockHeader) -> bool:
-        h = hdr.hash()
-        return h.startswith("0" * hdr.bits)
+        return bytes.fromhex(hdr.hash()) < pow_target(hdr.bits)
 
     def _verify_tx_basic(self, tx: Transaction) -> Tuple[bool, str]:
         if tx.fee < 0:
             return False, "negative fee"
-        if tx.version != 1:
+        if tx.fee > _I64_MAX:
+            return False, "fee out of range"
+        if not 0 <= tx.nonce <= _U64_MAX:
+            return False, "nonce out of range"
+        if tx.version not in (1, TX_VERSION):
             return False, "unsupported tx version"
         if len(tx.vout) == 0:
             return False, "no outputs"
         for o in tx.vout:
             if o.amount <= 0:
                 return False, "nonpositive output"
+            if o.amount > _I64_MAX:
+                return False, "output out of range"
             if not o.to_addr:
                 return False, "empty to_addr"
         # Signature verification intentionally not implemented here.
@@ -278,7 +616,9 @@ class ChainDB:
         return True, "ok"
 
     def _sum_outputs(self, tx: Transaction) -> int:
-        return sum(o.amount for o in tx.vout)
+        # map+attrgetter keeps the reduction in C; vouts are small (make_tx
+        # and coinbases have one), where this beats a generator expression
+        return sum(map(_amount_of, tx.vout))
 
     def _sender(self, tx: Transaction) -> Optional[str]:
         # single-sender simplification
@@ -293,6 +633,12 @@ class ChainDB:
 
     def _verify_block(self, blk: Block) -> Tuple[bool, str]:
         hdr = blk.header
+        if hdr.version not in (1, HEADER_VERSION):
+            return False, "unsupported header version"
+        if not (_is_hash32(hdr.prev_hash) and _is_hash32(hdr.merkle_root)):
+            return False, "malformed header hash"
+        if not (0 <= hdr.timestamp <= _I64_MAX and 0 <= hdr.nonce <= _U64_MAX):
+            return False, "header field out of range"
         if hdr.height != self.height() + 1:
             return False, "bad height"
         if hdr.prev_hash != self.tip().block_hash():
@@ -304,21 +650,21 @@ class ChainDB:
         if not self._check_pow(hdr):
             return False, "bad PoW"
 
-        txids = [t.txid() for t in blk.txs]
-        if merkle_root(txids) != hdr.merkle_root:
-            return False, "bad merkle root"
-
         if not blk.txs:
             return False, "empty block"
         if not self._is_coinbase(blk.txs[0]):
             return False, "first tx must be coinbase"
 
-        # basic tx checks
+        # basic tx checks; these also bound the fields v2 txids pack, so
+        # they run before merkle() hashes anything
         for t in blk.txs:
             ok, why = self._verify_tx_basic(t)
             if not ok:
                 return False, f"tx invalid: {why}"
 
+        if blk.merkle() != hdr.merkle_root:
+            return False, "bad merkle root"
+
         # accounting checks
         fees = sum(t.fee for t in blk.txs[1:])
         coinbase_out = self._sum_outputs(blk.txs[0])
@@ -342,10 +688,16 @@ class ChainDB:
     # State transition
     # ----------------------------
 
+    def _set_balance(self, addr: str, value: int):
+        if self._journal is not None:
+            self._journal.append((addr, self.balances.get(addr)))
+        self.balances[addr] = value
+        self._dirty.add(addr)
+
     def _apply_tx(self, tx: Transaction) -> Tuple[bool, str]:
         if self._is_coinbase(tx):
             for o in tx.vout:
-                self.balances[o.to_addr] = self.balances.get(o.to_addr, 0) + o.amount
+                self._set_balance(o.to_addr, self.balances.get(o.to_addr, 0) + o.amount)
             return True, "ok"
 
         sender = self._sender(tx)
@@ -355,20 +707,29 @@ class ChainDB:
         bal = self.balances.get(sender, 0)
         if bal < spend:
             return False, "insufficient funds"
-        self.balances[sender] = bal - spend
+        self._set_balance(sender, bal - spend)
         for o in tx.vout:
-            self.balances[o.to_addr] = self.balances.get(o.to_addr, 0) + o.amount
+            self._set_balance(o.to_addr, self.balances.get(o.to_addr, 0) + o.amount)
         return True, "ok"
 
     def _apply_block(self, blk: Block) -> Tuple[bool, str]:
-        # apply all txs in order; no reorg logic here
-        snap = dict(self.balances)
-        for t in blk.txs:
-            ok, why = self._apply_tx(t)
-            if not ok:
-                self.balances = snap
-                return False, f"apply failed: {why}"
-        return True, "ok"
+        # apply all txs in order; no reorg logic here.
+        # Only touched addresses are journaled, so a failed block is undone
+        # in O(touched) instead of snapshotting every balance up front.
+        self._journal = []
+        try:
+            for t in blk.txs:
+                ok, why = self._apply_tx(t)
+                if not ok:
+                    for addr, old in reversed(self._journal):
+                        if old is None:
+                            self.balances.pop(addr, None)
+                        else:
+                            self.balances[addr] = old
+                    return False, f"apply failed: {why}"
+            return True, "ok"
+        finally:
+            self._journal = None
 
     # ----------------------------
     # Mining & difficulty adjustment (simple)
@@ -390,12 +751,16 @@ class ChainDB:
 
     def _mine_block(self, blk: Block) -> Block:
         hdr = blk.header
-        nonce = 0
+        prefix, suffix = hdr.nonce_split()
+        mid = _sha256(prefix)  # midstate: the fixed prefix is hashed once
+        enc = hdr.nonce_encoder()
+        target = pow_target(hdr.bits)
+        start = 0
         while True:
-            nh = dataclasses.replace(hdr, nonce=nonce)
-            if self._check_pow(nh):
-                return Block(header=nh, txs=blk.txs)
-            nonce += 1
+            nonce = find_nonce(mid, enc, suffix, target, start, start + NONCE_BATCH)
+            if nonce is not None:
+                return blk.with_header(dataclasses.replace(hdr, nonce=nonce))
+            start += NONCE_BATCH
 
     def build_block_template(self, miner_addr: str) -> Block:
         self._adjust_difficulty()
@@ -412,20 +777,19 @@ class ChainDB:
         subsidy = self.policy.predict(miners, nodes, tx_count, mempool_size, fee_pressure)
 
         coinbase = Transaction(
-            version=1,
+            version=TX_VERSION,
             vin=[TxIn(from_addr="COINBASE")],
             vout=[TxOut(to_addr=miner_addr, amount=subsidy + fees)],
             fee=0,
-            nonce=int.from_bytes(os.urandom(4), "big"),
+            nonce=tx_nonce(),
             memo="coinbase",
         )
 
         all_txs = [coinbase] + txs
-        txids = [t.txid() for t in all_txs]
-        mr = merkle_root(txids)
+        mr = merkle_root([t.txid() for t in all_txs])
 
         hdr = BlockHeader(
-            version=1,
+            version=HEADER_VERSION,
             prev_hash=self.tip().block_hash(),
             merkle_root=mr,
             timestamp=now_ts(),
@@ -433,7 +797,9 @@ class ChainDB:
             bits=self.bits,
             nonce=0,
         )
-        return Block(header=hdr, txs=all_txs)
+        blk = Block(header=hdr, txs=all_txs)
+        blk._remember_merkle(mr)
+        return blk
 
     def submit_block(self, blk: Block) -> Tuple[bool, str]:
         ok, why = self._verify_block(blk)
@@ -449,7 +815,14 @@ class ChainDB:
 
         # remove included txs from mempool
         for t in blk.txs[1:]:
-            self.mempool.pop(t.txid(), None)
+            if self.mempool.pop(t.txid(), None) is None:
+                continue
+            sender = self._sender(t)
+            left = self.pending_spend.get(sender, 0) - (self._sum_outputs(t) + t.fee)
+            if left > 0:
+                self.pending_spend[sender] = left
+            else:
+                self.pending_spend.pop(sender, None)
         return True, "accepted"
 
     def add_tx_to_mempool(self, tx: Transaction) -> Tuple[bool, str]:
@@ -459,7 +832,17 @@ class ChainDB:
         txid = tx.txid()
         if txid in self.mempool:
             return False, "already in mempool"
+        sender = self._sender(tx)
+        if not sender:
+            return False, "unsupported vin"
+        # a tx the sender cannot cover on top of its pending txs would make
+        # the next template fail _apply_block, so refuse it here
+        spend = self._sum_outputs(tx) + tx.fee
+        pending = self.pending_spend.get(sender, 0)
+        if self.balances.get(sender, 0) - pending < spend:
+            return False, "insufficient funds"
         self.mempool[txid] = tx
+        self.pending_spend[sender] = pending + spend
         return True, txid
 
     # ----------------------------
@@ -469,11 +852,11 @@ class ChainDB:
     def make_tx(self, from_addr: str, to_addr: str, amount: int, fee: int, memo: str = "") -> Transaction:
         # no signature; placeholder
         return Transaction(
-            version=1,
+            version=TX_VERSION,
             vin=[TxIn(from_addr=from_addr, sig="")],
             vout=[TxOut(to_addr=to_addr, amount=amount)],
             fee=fee,
-            nonce=int.from_bytes(os.urandom(4), "big"),
+            nonce=tx_nonce(),
             memo=memo,
         )
 
@@ -503,16 +886,19 @@ def cmd_send(args):
 
 def cmd_mine(args):
     db = ChainDB(args.datadir)
-    tpl = db.build_block_template(args.miner_addr)
-    mined = db._mine_block(tpl)
-    ok, why = db.submit_block(mined)
-    if not ok:
-        print("error", why)
-        return
-    print("ok accepted")
-    print("height", db.height())
-    print("hash", mined.block_hash())
-    print("coinbase_paid", sum(o.amount for o in mined.txs[0].vout))
+    # several blocks in one run share a single blocks.jsonl append and state write
+    with db.batch():
+        for _ in range(args.count):
+            tpl = db.build_block_template(args.miner_addr)
+            mined = db._mine_block(tpl)
+            ok, why = db.submit_block(mined)
+            if not ok:
+                print("error", why)
+                return
+            print("ok accepted")
+            print("height", db.height())
+            print("hash", mined.block_hash())
+            print("coinbase_paid", db._sum_outputs(mined.txs[0]))
 
 def cmd_chain(args):
     db = ChainDB(args.datadir)
@@ -541,6 +927,7 @@ def main():
 
     s3 = sp.add_parser("mine")
     s3.add_argument("miner_addr")
+    s3.add_argument("--count", type=int, default=1)
     s3.set_defaults(func=cmd_mine)
 
     s4 = sp.add_parser("chain")
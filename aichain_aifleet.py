@@ -7,26 +7,67 @@
 # This is a research prototype / playground.
 
 import argparse
+import atexit
 import dataclasses
 import json
 import math
+import operator
 import os
 import random
 import time
+from array import array
 from typing import Any, Dict, List, Optional, Tuple
 
 import aichain
 import aiguardian
 
+# Optional C JSON encoder for the decision log / payloads
+try:
+    import orjson  # type: ignore
+
+    HAS_ORJSON = True
+except Exception:  # pragma: no cover - optional dependency
+    HAS_ORJSON = False
+
+
+def _log_line(obj: Dict[str, Any]) -> bytes:
+    if HAS_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, sort_keys=True) + "\n").encode("utf-8")
+
+
+def _payload_json(obj: Dict[str, Any]) -> str:
+    if HAS_ORJSON:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False)
+
 
 # ----------------------------
 # Bot identity + brain
 # ----------------------------
 
+ROLES = ("Sentinel", "Auditor", "Miner", "Dispatcher")
+N_WEIGHTS = 5  # w_fee, w_amount, w_outputs, w_entropy, w_memo
+COUNTERS = ("age", "accepted", "rejected", "quarantined", "mined_blocks", "earned_fees", "earned_subsidy")
+
+
+def policy_inputs(tx_features: "aiguardian.TxFeatures") -> Tuple[float, float, float, float, float]:
+    # normalize-ish; order matches the rows of AIFleet.W
+    return (
+        float(tx_features.fee) / 1e5,
+        float(tx_features.amount) / 1e8,
+        float(tx_features.outputs) / 10.0,
+        float(tx_features.addr_entropy) / 5.0,
+        float(tx_features.memo_len) / 200.0,
+    )
+
+
 @dataclasses.dataclass
 class BotGenome:
     # Small param vector; treat as a "tiny neural net" seed.
     # You can replace with real NN weights later.
+    __slots__ = ("w_fee", "w_amount", "w_outputs", "w_entropy", "w_memo", "bias")
+
     w_fee: float
     w_amount: float
     w_outputs: float
@@ -34,73 +75,115 @@ class BotGenome:
     w_memo: float
     bias: float
 
-    def mutate(self, sigma: float = 0.05) -> "BotGenome":
-        def m(x): return x + random.gauss(0.0, sigma)
+    def mutate(self, rng: random.Random, sigma: float = 0.05) -> "BotGenome":
+        # same noise source as AIFleet.evolve_if_needed, drawn from the fleet rng
+        n = _gauss_batch(rng, 6, sigma)
         return BotGenome(
-            w_fee=m(self.w_fee),
-            w_amount=m(self.w_amount),
-            w_outputs=m(self.w_outputs),
-            w_entropy=m(self.w_entropy),
-            w_memo=m(self.w_memo),
-            bias=m(self.bias),
+            w_fee=self.w_fee + n[0],
+            w_amount=self.w_amount + n[1],
+            w_outputs=self.w_outputs + n[2],
+            w_entropy=self.w_entropy + n[3],
+            w_memo=self.w_memo + n[4],
+            bias=self.bias + n[5],
         )
 
     @staticmethod
-    def random_init() -> "BotGenome":
+    def random_init(rng: random.Random) -> "BotGenome":
         # small random init
         return BotGenome(
-            w_fee=random.uniform(-0.5, 0.5),
-            w_amount=random.uniform(-0.5, 0.5),
-            w_outputs=random.uniform(-0.5, 0.5),
-            w_entropy=random.uniform(-0.5, 0.5),
-            w_memo=random.uniform(-0.5, 0.5),
-            bias=random.uniform(-0.2, 0.2),
+            w_fee=rng.uniform(-0.5, 0.5),
+            w_amount=rng.uniform(-0.5, 0.5),
+            w_outputs=rng.uniform(-0.5, 0.5),
+            w_entropy=rng.uniform(-0.5, 0.5),
+            w_memo=rng.uniform(-0.5, 0.5),
+            bias=rng.uniform(-0.2, 0.2),
         )
 
 
-@dataclasses.dataclass
+def _gauss_batch(rng: random.Random, n: int, sigma: float) -> List[float]:
+    """
+    n draws from N(0, sigma). Box-Muller with both outputs of each pair used;
+    a few times cheaper than n calls to rng.gauss.
+    """
+    rnd = rng.random
+    log, sqrt, cos, sin, tau = math.log, math.sqrt, math.cos, math.sin, math.tau
+    out: List[float] = []
+    push = out.extend
+    for _ in range((n + 1) // 2):
+        r = sigma * sqrt(-2.0 * log(1.0 - rnd()))
+        t = tau * rnd()
+        push((r * cos(t), r * sin(t)))
+    del out[n:]
+    return out
+
+
+class _Column:
+    """Attribute of AIBot backed by the fleet array of the same name."""
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, bot, owner=None):
+        if bot is None:
+            return self
+        return getattr(bot.fleet, self.name)[bot.bot_id]
+
+    def __set__(self, bot, value):
+        getattr(bot.fleet, self.name)[bot.bot_id] = value
+
+
 class AIBot:
-    bot_id: int
-    name: str
-    role: str  # e.g., "Sentinel", "Auditor", "Miner", "Dispatcher"
-    genome: BotGenome
+    """
+    Lightweight view of one bot. All state lives in the AIFleet arrays;
+    views are created on demand and are cheap to throw away.
+    """
+
+    __slots__ = ("fleet", "bot_id")
 
     # Lifetime stats
-    age: int = 0
-    accepted: int = 0
-    rejected: int = 0
-    quarantined: int = 0
-    mined_blocks: int = 0
-    earned_fees: int = 0
-    earned_subsidy: int = 0
+    age = _Column()
+    accepted = _Column()
+    rejected = _Column()
+    quarantined = _Column()
+    mined_blocks = _Column()
+    earned_fees = _Column()
+    earned_subsidy = _Column()
 
     # “Trust” / reputation
-    score: float = 0.0
+    score = _Column()
+
+    def __init__(self, fleet: "AIFleet", bot_id: int):
+        self.fleet = fleet
+        self.bot_id = bot_id
+
+    @property
+    def role(self) -> str:  # e.g., "Sentinel", "Auditor", "Miner", "Dispatcher"
+        return ROLES[self.fleet.role_id[self.bot_id]]
+
+    @property
+    def name(self) -> str:
+        return self.fleet.name_of(self.bot_id)
+
+    @property
+    def genome(self) -> BotGenome:
+        i = self.bot_id
+        return BotGenome(*self.fleet.W[i * N_WEIGHTS:(i + 1) * N_WEIGHTS], bias=self.fleet.bias[i])
+
+    @genome.setter
+    def genome(self, g: BotGenome):
+        i = self.bot_id
+        self.fleet.W[i * N_WEIGHTS:(i + 1) * N_WEIGHTS] = array("d", (g.w_fee, g.w_amount, g.w_outputs, g.w_entropy, g.w_memo))
+        self.fleet.bias[i] = g.bias
+
+    def __repr__(self) -> str:
+        return f"AIBot({self.bot_id}, {self.name!r}, score={self.score})"
 
     def policy_min_fee(self, tx_features: "aiguardian.TxFeatures") -> int:
         """
         Bot-specific fee policy:
         outputs/memo/entropy increase fee requirement; higher fee lowers suspicion.
         """
-        # normalize-ish
-        x_fee = float(tx_features.fee) / 1e5
-        x_amount = float(tx_features.amount) / 1e8
-        x_outputs = float(tx_features.outputs) / 10.0
-        x_entropy = float(tx_features.addr_entropy) / 5.0
-        x_memo = float(tx_features.memo_len) / 200.0
-
-        z = (
-            self.genome.w_fee * x_fee
-            + self.genome.w_amount * x_amount
-            + self.genome.w_outputs * x_outputs
-            + self.genome.w_entropy * x_entropy
-            + self.genome.w_memo * x_memo
-            + self.genome.bias
-        )
-        # map z -> multiplier
-        mult = 1.0 + max(0.0, z)  # only penalize upward
-        base = 1000
-        return int(base * mult)
+        return self.fleet.min_fee(self.bot_id, policy_inputs(tx_features))
 
     def decide(self, guardian_score: float, threshold: float, min_fee_required: int, offered_fee: int) -> Tuple[str, str]:
         """
@@ -126,6 +209,8 @@ class AIFleet:
     Manages many bots efficiently:
     - We can *simulate* 100k bots without using them all each decision.
     - Choose a small committee per tx/block (committee_size).
+    - Bot state is stored column-wise (one flat array per field, row-major
+      weights in W) instead of one Python object per bot; AIBot is a view.
     """
 
     def __init__(
@@ -137,31 +222,117 @@ class AIFleet:
         elite_fraction: float = 0.05,
         mutation_sigma: float = 0.05,
     ):
-        random.seed(seed)
+        self.rng = random.Random(seed)
         self.size = size
         self.committee_size = committee_size
         self.reproduction_interval_blocks = reproduction_interval_blocks
         self.elite_fraction = elite_fraction
         self.mutation_sigma = mutation_sigma
 
-        self.bots: List[AIBot] = []
         self._make_fleet()
 
     def _make_fleet(self):
-        roles = ["Sentinel", "Auditor", "Miner", "Dispatcher"]
-        for i in range(self.size):
-            role = roles[i % len(roles)]
-            name = f"{role}-{i:05d}"
-            self.bots.append(AIBot(
-                bot_id=i,
-                name=name,
-                role=role,
-                genome=BotGenome.random_init(),
-            ))
+        n = self.size
+        self.W = array("d")
+        self.bias = array("d")
+        self.role_id = array("B", [i % len(ROLES) for i in range(n)])
+        for name in COUNTERS:
+            setattr(self, name, array("q", bytes(8 * n)))
+        self.score = array("d", bytes(8 * n))
+
+        # same draw order as BotGenome.random_init(self.rng), one bot at a time
+        uniform = self.rng.uniform
+        W, bias = self.W, self.bias
+        for _ in range(n):
+            W.extend((uniform(-0.5, 0.5), uniform(-0.5, 0.5), uniform(-0.5, 0.5),
+                      uniform(-0.5, 0.5), uniform(-0.5, 0.5)))
+            bias.append(uniform(-0.2, 0.2))
+
+    def bot(self, i: int) -> AIBot:
+        return AIBot(self, i)
+
+    def name_of(self, i: int) -> str:
+        return f"{ROLES[self.role_id[i]]}-{i:05d}"
+
+    def committee_ids(self) -> List[int]:
+        # sample committee without scanning entire fleet
+        n, k = self.size, self.committee_size
+        if 2 * k > n:
+            return self.rng.sample(range(n), k=min(k, n))
+        # sparse draw: far cheaper than random.sample's _randbelow loop for k << n
+        rnd = self.rng.random
+        picked: Dict[int, None] = {}
+        while len(picked) < k:
+            picked[int(rnd() * n)] = None
+        return list(picked)
 
     def committee(self) -> List[AIBot]:
-        # sample committee without scanning entire fleet
-        return random.sample(self.bots, k=min(self.committee_size, len(self.bots)))
+        return [AIBot(self, i) for i in self.committee_ids()]
+
+    def min_fee(self, i: int, x: Tuple[float, float, float, float, float]) -> int:
+        o = i * N_WEIGHTS
+        W = self.W
+        z = W[o] * x[0] + W[o + 1] * x[1] + W[o + 2] * x[2] + W[o + 3] * x[3] + W[o + 4] * x[4] + self.bias[i]
+        # map z -> multiplier
+        mult = 1.0 + max(0.0, z)  # only penalize upward
+        base = 1000
+        return int(base * mult)
+
+    def committee_vote(
+        self,
+        ids: List[int],
+        x: Tuple[float, float, float, float, float],
+        guardian_score: float,
+        threshold: float,
+        offered_fee: int,
+    ) -> Tuple[str, Dict[str, int], str, int]:
+        """
+        Runs AIBot.policy_min_fee + AIBot.decide for every member in one pass
+        over the fleet arrays. Returns (decision, votes, top_reason, leader_id):
+        the majority decision (ties favour allow, then deny), the per-decision
+        counts, the most common reason and the best-scored member.
+        """
+        x0, x1, x2, x3, x4 = x
+        W, bias, role_id = self.W, self.bias, self.role_id
+        high_risk = guardian_score >= threshold
+        fee_low = risky_quarantine = risky_deny = 0
+        # offered < int(1000 * (1 + max(0, z)))  <=>  1000 * (1 + z) >= offered + 1,
+        # and every member denies below the 1000 floor without looking at z.
+        need = float(offered_fee + 1)
+        if need <= 1000.0:
+            fee_low = len(ids)
+        else:
+            for i in ids:
+                o = i * N_WEIGHTS
+                z = W[o] * x0 + W[o + 1] * x1 + W[o + 2] * x2 + W[o + 3] * x3 + W[o + 4] * x4 + bias[i]
+                if 1000 * (1.0 + z) >= need:
+                    fee_low += 1
+                elif high_risk:
+                    if role_id[i] < 2:  # Sentinel/Auditor quarantine instead of deny
+                        risky_quarantine += 1
+                    else:
+                        risky_deny += 1
+        other = len(ids) - fee_low
+        allow = 0 if high_risk else other
+        deny = fee_low + risky_deny
+        votes = {"allow": allow, "deny": deny, "quarantine": risky_quarantine}
+        if allow >= deny and allow >= risky_quarantine:
+            decision = "allow"
+        elif deny >= risky_quarantine:
+            decision = "deny"
+        else:
+            decision = "quarantine"
+
+        other_reason = "guardian_high_risk" if high_risk else "ok"
+        if fee_low != other:
+            top_reason = "fee_too_low_for_policy" if fee_low > other else other_reason
+        elif not ids:
+            top_reason = "ok"
+        else:
+            # tie: whichever reason the first member gave, as with a counting dict
+            top_reason = "fee_too_low_for_policy" if self.min_fee(ids[0], x) > offered_fee else other_reason
+        leader = max(ids, key=self.score.__getitem__)
+        return decision, votes, top_reason, leader
 
     def miner_of_round(self) -> AIBot:
         # weighted by reputation score (softmax-ish)
@@ -169,11 +340,12 @@ class AIFleet:
         c = self.committee()
         return max(c, key=lambda b: b.score)
 
-    def update_reputation(self, bot: AIBot):
+    def update_reputation(self, i: int):
         # simple reward shaping: fees+subsidy - penalties
-        reward = (bot.earned_fees / 1e6) + (bot.earned_subsidy / 1e7)
-        penalty = (bot.rejected * 0.01) + (bot.quarantined * 0.005)
-        bot.score = max(0.0, reward - penalty)
+        # (call after changing any of bot i's counters; evolution relies on it)
+        reward = (self.earned_fees[i] / 1e6) + (self.earned_subsidy[i] / 1e7)
+        penalty = (self.rejected[i] * 0.01) + (self.quarantined[i] * 0.005)
+        self.score[i] = max(0.0, reward - penalty)
 
     def evolve_if_needed(self, height: int):
         if height == 0:
@@ -181,50 +353,56 @@ class AIFleet:
         if height % self.reproduction_interval_blocks != 0:
             return
 
-        # Update reputations
-        for b in self.bots:
-            self.update_reputation(b)
+        # Scores are already current: update_reputation runs whenever a
+        # bot's counters change, so there is no fleet-wide recompute here.
+        score = self.score
 
-        # Select elites
-        elites_n = max(1, int(self.elite_fraction * len(self.bots)))
-        elites = sorted(self.bots, key=lambda b: b.score, reverse=True)[:elites_n]
+        # One stable sort serves both ends: worst first, elites at the tail
+        elites_n = max(1, int(self.elite_fraction * self.size))
+        order = sorted(range(self.size), key=score.__getitem__)
+        elites = order[-elites_n:]
 
         # Replace worst fraction with mutated children of elites
         replace_n = elites_n
-        worst = sorted(self.bots, key=lambda b: b.score)[:replace_n]
-
-        for w in worst:
-            parent = random.choice(elites)
-            child_genome = parent.genome.mutate(sigma=self.mutation_sigma)
-            w.genome = child_genome
-            w.role = parent.role  # inherit role for now
-            w.name = f"{w.role}-{w.bot_id:05d}"
-            w.age = 0
-            w.accepted = w.rejected = w.quarantined = 0
-            w.mined_blocks = 0
-            w.earned_fees = w.earned_subsidy = 0
-            w.score = 0.0
+        worst = order[:replace_n]
+
+        # Parents and all mutation noise are drawn up front, one row of
+        # N_WEIGHTS + 1 values (weights then bias) per child.
+        parents = self.rng.choices(elites, k=replace_n)
+        step = N_WEIGHTS + 1
+        noise = _gauss_batch(self.rng, replace_n * step, self.mutation_sigma)
+        W, bias, role_id = self.W, self.bias, self.role_id
+        for o, w, p in zip(range(0, replace_n * step, step), worst, parents):
+            W[w * N_WEIGHTS:(w + 1) * N_WEIGHTS] = array(
+                "d", map(operator.add, W[p * N_WEIGHTS:(p + 1) * N_WEIGHTS], noise[o:o + N_WEIGHTS]))
+            bias[w] = bias[p] + noise[o + N_WEIGHTS]
+            role_id[w] = role_id[p]  # inherit role for now
+        for col in [getattr(self, name) for name in COUNTERS] + [score]:
+            for w in worst:
+                col[w] = 0
 
 
 # ----------------------------
 # Bridge: patch ChainDB to use Fleet + Guardian
 # ----------------------------
 
-def _tx_to_guardian_dict(tx: "aichain.Transaction") -> Dict[str, Any]:
+def _hour_of(ts: int) -> int:
+    return (ts // 3600) % 24 if ts > 0 else 0
+
+
+def _tx_inputs(tx: "aichain.Transaction", ts: int) -> Tuple[List[float], Tuple[float, float, float, float, float]]:
+    """
+    Builds the guardian feature vector (aiguardian.TxFeatures.to_vector layout)
+    and the committee policy inputs straight from the tx, so the admission path
+    skips the intermediate dict/TxFeatures and computes the entropy once.
+    """
     amount = float(sum(o.amount for o in tx.vout))
     fee = float(tx.fee)
-    outputs = int(len(tx.vout))
-    memo = str(tx.memo or "")
-    to_addr = tx.vout[0].to_addr if tx.vout else ""
-    return {
-        "amount": amount,
-        "fee": fee,
-        "outputs": outputs,
-        "memo": memo,
-        "to_addr": to_addr,
-        "burst_score": 0.0,
-        "timestamp": int(aichain.now_ts()),
-    }
+    outputs = len(tx.vout)
+    memo_len = len(str(tx.memo or ""))
+    entropy = aiguardian.shannon_entropy(tx.vout[0].to_addr if tx.vout else "")
+    gvec = [amount, fee, float(outputs), float(memo_len), entropy, 0.0, float(_hour_of(ts)), 1.0]
+    return gvec, (fee / 1e5, amount / 1e8, outputs / 10.0, entropy / 5.0, memo_len / 200.0)
 
 
 def install_ai_fleet_patch(
@@ -239,100 +417,107 @@ def install_ai_fleet_patch(
     original_add = aichain.ChainDB.add_tx_to_mempool
     original_build_tpl = aichain.ChainDB.build_block_template
 
+    # one append handle for the life of the patch; flushed per block and at exit
+    log_fh = None
+    if log_path:
+        try:
+            log_fh = open(log_path, "ab", buffering=1 << 16)
+            atexit.register(log_fh.close)
+        except Exception:
+            log_fh = None
+
     def _log(obj: Dict[str, Any]):
-        if not log_path:
+        if log_fh is None:
             return
         try:
-            with open(log_path, "a", encoding="utf-8") as f:
-                f.write(json.dumps(obj, sort_keys=True) + "\n")
+            log_fh.write(_log_line(obj))
         except Exception:
             pass
 
     def guarded_add(self: "aichain.ChainDB", tx: "aichain.Transaction"):
+        # pass-through coinbase (shouldn't happen); checked before any other work
+        vin = tx.vin
+        if len(vin) == 1 and vin[0].from_addr == "COINBASE":
+            return original_add(self, tx)
+
         # init quarantine store on db instance
         if not hasattr(self, "quarantine"):
             self.quarantine = {}  # type: ignore[attr-defined]
 
-        # pass-through coinbase (shouldn't happen)
-        if len(tx.vin) == 1 and tx.vin[0].from_addr == "COINBASE":
-            return original_add(self, tx)
-
-        txd = _tx_to_guardian_dict(tx)
-        feats = aiguardian.extract_features(txd)
-        gscore = guardian.score(txd)
-
-        # committee vote
-        committee = fleet.committee()
-        votes = {"allow": 0, "deny": 0, "quarantine": 0}
-        reasons: Dict[str, int] = {}
-
-        for bot in committee:
-            min_fee = bot.policy_min_fee(feats)
-            decision, reason = bot.decide(gscore, threshold, min_fee, int(tx.fee))
-            votes[decision] += 1
-            reasons[reason] = reasons.get(reason, 0) + 1
-
-        # majority decision
-        decision = max(votes.items(), key=lambda kv: kv[1])[0]
-        top_reason = max(reasons.items(), key=lambda kv: kv[1])[0] if reasons else "ok"
-
-        # pick a "responsible bot" to attribute this action (leader = best score in committee)
-        leader = max(committee, key=lambda b: b.score)
+        txid = tx.txid()
+        ts = aichain.now_ts()  # one clock read per admission: features + log
+        # guardian score + policy inputs are memoized on the tx (like its txid),
+        # so a tx offered again, e.g. after topping up funds, is not rescored;
+        # the score depends on the hour-of-day feature, so it keys the memo too
+        hour = _hour_of(ts)
+        memo = tx.__dict__.get("_fleet_inputs")
+        if memo is not None and memo[0] is guardian and memo[1] == hour:
+            _, _, gscore, x = memo
+        else:
+            gvec, x = _tx_inputs(tx, ts)
+            gscore = guardian.model.predict_proba(gvec)
+            object.__setattr__(tx, "_fleet_inputs", (guardian, hour, gscore, x))
+
+        # committee vote; leader = best score in committee, the "responsible bot"
+        decision, votes, top_reason, leader = fleet.committee_vote(
+            fleet.committee_ids(), x, gscore, threshold, int(tx.fee))
 
         if decision == "allow":
             ok, out = original_add(self, tx)
             if ok:
-                leader.accepted += 1
+                fleet.accepted[leader] += 1
             else:
-                leader.rejected += 1
+                fleet.rejected[leader] += 1
+                fleet.update_reputation(leader)
 
             _log({
-                "ts": int(aichain.now_ts()),
+                "ts": ts,
                 "action": "mempool_admission",
-                "txid": tx.txid(),
+                "txid": txid,
                 "guardian_score": float(gscore),
                 "threshold": float(threshold),
                 "decision": "allow" if ok else "deny",
                 "reason": top_reason if ok else out,
-                "leader": leader.name,
+                "leader": fleet.name_of(leader),
                 "votes": votes,
             })
             return (ok, out)
 
         if decision == "quarantine":
-            qid = tx.txid()
-            self.quarantine[qid] = tx.to_dict()  # type: ignore[attr-defined]
-            leader.quarantined += 1
+            self.quarantine[txid] = tx.to_dict()  # type: ignore[attr-defined]
+            fleet.quarantined[leader] += 1
+            fleet.update_reputation(leader)
             payload = {
                 "allow": False,
                 "warning": True,
                 "message": "Transacción enviada a cuarentena por comité IA",
-                "txid": qid,
+                "txid": txid,
                 "guardian_score": float(gscore),
                 "threshold": float(threshold),
-                "leader": leader.name,
+                "leader": fleet.name_of(leader),
                 "votes": votes,
                 "reason": top_reason,
                 "hint": "Sube fee, reduce outputs/memo, evita ráfagas. Reintenta.",
             }
-            _log({"ts": int(aichain.now_ts()), "action": "quarantine", **payload})
-            return (False, json.dumps(payload, ensure_ascii=False))
+            _log({"ts": ts, "action": "quarantine", **payload})
+            return (False, _payload_json(payload))
 
         # deny
-        leader.rejected += 1
+        fleet.rejected[leader] += 1
+        fleet.update_reputation(leader)
         payload = {
             "allow": False,
             "warning": True,
             "message": "Transacción rechazada por comité IA",
-            "txid": tx.txid(),
+            "txid": txid,
             "guardian_score": float(gscore),
             "threshold": float(threshold),
-            "leader": leader.name,
+            "leader": fleet.name_of(leader),
             "votes": votes,
             "reason": top_reason,
         }
-        _log({"ts": int(aichain.now_ts()), "action": "deny", **payload})
-        return (False, json.dumps(payload, ensure_ascii=False))
+        _log({"ts": ts, "action": "deny", **payload})
+        return (False, _payload_json(payload))
 
     def fleet_build_template(self: "aichain.ChainDB", miner_addr: str):
         """
@@ -354,33 +539,31 @@ def install_ai_fleet_patch(
         fees = sum(t.fee for t in blk.txs[1:])
         subsidy = max(0, paid - fees)
 
-        # find miner bot
-        # (fast path: parse bot_id from name suffix; else linear scan fallback)
-        bot = None
-        if "-" in miner_addr:
-            try:
-                suffix = miner_addr.split("-")[-1]
-                bid = int(suffix)
-                if 0 <= bid < len(fleet.bots):
-                    bot = fleet.bots[bid]
-            except Exception:
-                bot = None
-        if bot is None:
-            for b in fleet.bots:
-                if b.name == miner_addr:
-                    bot = b
-                    break
-
-        if bot:
-            bot.mined_blocks += 1
-            bot.earned_fees += int(fees)
-            bot.earned_subsidy += int(subsidy)
-            bot.age += 1
-            fleet.update_reputation(bot)
+        # find miner bot: names are f"{role}-{bot_id:05d}", so the suffix is the index
+        _, dash, suffix = miner_addr.rpartition("-")
+        try:
+            bid: Optional[int] = int(suffix) if dash else None
+        except ValueError:
+            bid = None
+        if bid is not None and not 0 <= bid < fleet.size:
+            bid = None
+
+        if bid is not None:
+            fleet.mined_blocks[bid] += 1
+            fleet.earned_fees[bid] += int(fees)
+            fleet.earned_subsidy[bid] += int(subsidy)
+            fleet.age[bid] += 1
+            fleet.update_reputation(bid)
 
         # evolve occasionally
         fleet.evolve_if_needed(self.height())
 
+        if log_fh is not None:
+            try:
+                log_fh.flush()
+            except Exception:
+                pass
+
     # install patches
     aichain.ChainDB.add_tx_to_mempool = guarded_add  # type: ignore[attr-defined]
     aichain.ChainDB.build_block_template = fleet_build_template  # type: ignore[attr-defined]
@@ -13,11 +13,18 @@
 # We patch at runtime.
 
 import argparse
+import atexit
 import dataclasses
 import hashlib
 import json
 import os
+import random
+import sys
+import threading
 import time
+import weakref
+from array import array
+from collections import deque
 from typing import Any, Dict, List, Optional, Tuple
 
 import aichain
@@ -41,11 +48,38 @@ def h256(data: bytes) -> str:
 def jcanon(obj: Any) -> bytes:
     return json.dumps(obj, sort_keys=True, separators=(",", ":")).encode("utf-8")
 
+def _canon_receipt(txid: str, ts: int, reason_code: str, score_bucket: str, reveal_secret: str) -> bytes:
+    """
+    jcanon of the receipt payload with the key order baked in. Only used when
+    no field needs JSON escaping (hex ids, fixed codes); anything else goes
+    through json.dumps so the bytes are always identical to jcanon.
+    """
+    plain = reason_code + reveal_secret + score_bucket + txid
+    if type(ts) is int and plain.isascii() and plain.isprintable() and '"' not in plain and "\\" not in plain:
+        return (f'{{"reason_code":"{reason_code}","reveal_secret":"{reveal_secret}",'
+                f'"score_bucket":"{score_bucket}","ts":{ts},"txid":"{txid}"}}').encode("ascii")
+    return jcanon({
+        "txid": txid,
+        "ts": ts,
+        "reason_code": reason_code,
+        "score_bucket": score_bucket,
+        "reveal_secret": reveal_secret,
+    })
+
 def ensure_dir(path: str):
     d = os.path.dirname(path)
     if d:
         os.makedirs(d, exist_ok=True)
 
+# State stores whose pending writes are flushed at exit. Held weakly so that
+# registering does not keep a store alive for the rest of the process.
+_flush_at_exit: "weakref.WeakSet[Any]" = weakref.WeakSet()
+
+@atexit.register
+def _flush_stores():
+    for store in list(_flush_at_exit):
+        store.flush()
+
 # ----------------------------
 # ZK-like rejection receipts (stub)
 # ----------------------------
@@ -67,27 +101,23 @@ class RejectionReceipt:
     reveal_secret: str      # random string
 
     def commitment(self) -> str:
-        payload = {
-            "txid": self.txid,
-            "ts": self.ts,
-            "reason_code": self.reason_code,
-            "score_bucket": self.score_bucket,
-            "reveal_secret": self.reveal_secret,
-        }
-        return h256(jcanon(payload))
+        return h256(_canon_receipt(self.txid, self.ts, self.reason_code, self.score_bucket, self.reveal_secret))
 
-    def proof_stub(self) -> str:
+    def proof_stub(self, commitment: Optional[str] = None) -> str:
         # Placeholder: in real ZK, this would be a proof that commitment encodes
         # a valid rejection under policy without revealing reason_code, etc.
         # We return a hash "tag" as a stand-in.
-        return h256(("proof:" + self.commitment()).encode("utf-8"))
+        if commitment is None:
+            commitment = self.commitment()
+        return h256(("proof:" + commitment).encode("utf-8"))
 
     def public_packet(self, status: str) -> Dict[str, Any]:
+        commitment = self.commitment()
         return {
             "status": status,
             "txid": self.txid,
-            "receipt_commitment": self.commitment(),
-            "receipt_proof": self.proof_stub(),
+            "receipt_commitment": commitment,
+            "receipt_proof": self.proof_stub(commitment),
             "note": "Privacy receipt (stub). Replace with real ZK proof later.",
         }
 
@@ -108,20 +138,24 @@ class BurstTracker:
     def __init__(self, window_sec: int = 60, max_events: int = 10):
         self.window = int(window_sec)
         self.max_events = int(max_events)
-        self.events: Dict[str, List[int]] = {}
+        self.events: Dict[str, "deque[int]"] = {}
 
     def observe(self, sender: str, ts: int) -> float:
         if not sender:
             return 0.0
-        lst = self.events.get(sender, [])
+        dq = self.events.get(sender)
+        if dq is None:
+            dq = self.events[sender] = deque()
+        # timestamps arrive in order, so expired ones are always at the left
         cutoff = ts - self.window
-        lst = [t for t in lst if t >= cutoff]
-        lst.append(ts)
-        self.events[sender] = lst
-        return float(len(lst)) / float(max(1, self.max_events))
+        while dq and dq[0] < cutoff:
+            dq.popleft()
+        dq.append(ts)
+        return float(len(dq)) / float(max(1, self.max_events))
 
     def snapshot(self) -> Dict[str, Any]:
-        return {"window": self.window, "max_events": self.max_events, "events": self.events}
+        return {"window": self.window, "max_events": self.max_events,
+                "events": {k: list(v) for k, v in self.events.items()}}
 
     @staticmethod
     def load(path: str, window_sec: int, max_events: int) -> "BurstTracker":
@@ -129,7 +163,7 @@ class BurstTracker:
             with open(path, "r", encoding="utf-8") as f:
                 obj = json.loads(f.read())
             bt = BurstTracker(int(obj.get("window", window_sec)), int(obj.get("max_events", max_events)))
-            bt.events = {k: [int(x) for x in v] for k, v in obj.get("events", {}).items()}
+            bt.events = {k: deque(sorted(int(x) for x in v)) for k, v in obj.get("events", {}).items()}
             return bt
         return BurstTracker(window_sec, max_events)
 
@@ -144,6 +178,29 @@ class BurstTracker:
 # AI Fleet (minimal: committee + miner selection)
 # ----------------------------
 
+ROLES = ("Sentinel", "Auditor", "Miner", "Dispatcher")
+N_WEIGHTS = 6  # w_fee, w_amount, w_outputs, w_entropy, w_memo, w_burst
+COUNTERS = ("accepted", "rejected", "quarantined", "mined_blocks", "earned_fees", "earned_subsidy")
+
+# Binary fleet snapshot: magic, one JSON header line, then the raw columns in
+# _BIN_COLUMNS order. Written only when asked for (FleetState(binary=True));
+# load() tells the two formats apart by this magic, not by the file name.
+_BIN_MAGIC = b"RMFLEET\x02\n"
+_BIN_COLUMNS = ("W", "bias", "score", "role_id") + COUNTERS
+
+
+def policy_inputs(feats: "aiguardian.TxFeatures") -> Tuple[float, float, float, float, float, float]:
+    # normalized once per tx; order matches the rows of FleetState.W
+    return (
+        float(feats.fee) / 1e5,
+        float(feats.amount) / 1e8,
+        float(feats.outputs) / 10.0,
+        float(feats.addr_entropy) / 5.0,
+        float(feats.memo_len) / 200.0,
+        float(feats.burst_score),
+    )
+
+
 @dataclasses.dataclass
 class BotGenome:
     w_fee: float
@@ -155,7 +212,11 @@ class BotGenome:
     bias: float
 
     def to_dict(self) -> Dict[str, Any]:
-        return dataclasses.asdict(self)
+        return {
+            "w_fee": self.w_fee, "w_amount": self.w_amount, "w_outputs": self.w_outputs,
+            "w_entropy": self.w_entropy, "w_memo": self.w_memo, "w_burst": self.w_burst,
+            "bias": self.bias,
+        }
 
     @staticmethod
     def from_dict(d: Dict[str, Any]) -> "BotGenome":
@@ -164,7 +225,6 @@ class BotGenome:
     @staticmethod
     def random_init(seed: int) -> "BotGenome":
         # deterministic init per bot seed
-        import random
         r = random.Random(seed)
         return BotGenome(
             w_fee=r.uniform(-0.5, 0.5),
@@ -176,41 +236,53 @@ class BotGenome:
             bias=r.uniform(-0.2, 0.2),
         )
 
-@dataclasses.dataclass
+
+class _Column:
+    """Attribute of AIBot backed by the FleetState array of the same name."""
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, bot, owner=None):
+        if bot is None:
+            return self
+        return getattr(bot.fleet, self.name)[bot.bot_id]
+
+    def __set__(self, bot, value):
+        getattr(bot.fleet, self.name)[bot.bot_id] = value
+
+
 class AIBot:
-    bot_id: int
-    name: str
-    role: str
-    genome: BotGenome
-    score: float = 0.0
-
-    accepted: int = 0
-    rejected: int = 0
-    quarantined: int = 0
-    mined_blocks: int = 0
-    earned_fees: int = 0
-    earned_subsidy: int = 0
+    """View of one bot; all state lives in the FleetState arrays."""
+
+    score = _Column()
+
+    accepted = _Column()
+    rejected = _Column()
+    quarantined = _Column()
+    mined_blocks = _Column()
+    earned_fees = _Column()
+    earned_subsidy = _Column()
+
+    def __init__(self, fleet: "FleetState", bot_id: int):
+        self.fleet = fleet
+        self.bot_id = bot_id
+
+    @property
+    def role(self) -> str:
+        return ROLES[self.fleet.role_id[self.bot_id]]
+
+    @property
+    def name(self) -> str:
+        return self.fleet.name_of(self.bot_id)
+
+    @property
+    def genome(self) -> BotGenome:
+        i = self.bot_id
+        return BotGenome(*self.fleet.W[i * N_WEIGHTS:(i + 1) * N_WEIGHTS], bias=self.fleet.bias[i])
 
     def policy_min_fee(self, feats: "aiguardian.TxFeatures") -> int:
-        x_fee = float(feats.fee) / 1e5
-        x_amount = float(feats.amount) / 1e8
-        x_outputs = float(feats.outputs) / 10.0
-        x_entropy = float(feats.addr_entropy) / 5.0
-        x_memo = float(feats.memo_len) / 200.0
-        x_burst = float(feats.burst_score)
-
-        z = (
-            self.genome.w_fee * x_fee
-            + self.genome.w_amount * x_amount
-            + self.genome.w_outputs * x_outputs
-            + self.genome.w_entropy * x_entropy
-            + self.genome.w_memo * x_memo
-            + self.genome.w_burst * x_burst
-            + self.genome.bias
-        )
-        mult = 1.0 + max(0.0, z)
-        base = 1000
-        return int(base * mult)
+        return self.fleet.min_fee(self.bot_id, policy_inputs(feats))
 
     def decide(self, guardian_score: float, threshold: float, min_fee_required: int, offered_fee: int) -> Tuple[str, str]:
         if offered_fee < min_fee_required:
@@ -222,12 +294,30 @@ class AIBot:
         return ("allow", "ok")
 
 class FleetState:
-    def __init__(self, path: str, size: int, seed: int, committee_size: int):
+    """
+    Bots are stored column-wise: W holds N_WEIGHTS floats per bot (row-major),
+    with parallel bias/score/role_id arrays and one int64 array per counter.
+    AIBot objects are views created on demand.
+
+    save() writes synchronously. save_async() hands a copy of the arrays to a
+    background writer instead; while a copy is queued or being written further
+    calls only mark the state dirty, and flush() (also run at exit) waits for
+    the writer and writes whatever is still dirty.
+    """
+
+    def __init__(self, path: str, size: int, seed: int, committee_size: int, binary: bool = False):
         self.path = path
+        self.binary = bool(binary)
         self.size = int(size)
         self.seed = int(seed)
         self.committee_size = int(committee_size)
-        self.bots: List[AIBot] = []
+        self._dirty = False
+        self._pending: Optional["FleetState"] = None
+        self._writing = False
+        self._writer: Optional[threading.Thread] = None
+        self._cv = threading.Condition()
+        self._committee_key: Optional[Tuple[int, int, int]] = None
+        self._committee_ids: List[int] = []
 
         if os.path.exists(self.path):
             self.load()
@@ -235,81 +325,270 @@ class FleetState:
             self._init()
             self.save()
 
+    def _alloc(self, n: int):
+        self.W = array("d", bytes(8 * N_WEIGHTS * n))
+        self.bias = array("d", bytes(8 * n))
+        self.score = array("d", bytes(8 * n))
+        self.role_id = array("B", [i % len(ROLES) for i in range(n)])
+        for name in COUNTERS:
+            setattr(self, name, array("q", bytes(8 * n)))
+
     def _init(self):
-        roles = ["Sentinel", "Auditor", "Miner", "Dispatcher"]
-        self.bots = []
+        self._alloc(self.size)
+        # same per-bot seeding as BotGenome.random_init, reusing one generator
+        r = random.Random()
+        W, bias = self.W, self.bias
         for i in range(self.size):
-            role = roles[i % len(roles)]
-            name = f"{role}-{i:05d}"
-            genome = BotGenome.random_init(self.seed * 1000003 + i)
-            self.bots.append(AIBot(bot_id=i, name=name, role=role, genome=genome, score=0.0))
+            r.seed(self.seed * 1000003 + i)
+            uniform = r.uniform
+            o = i * N_WEIGHTS
+            W[o:o + N_WEIGHTS] = array("d", (uniform(-0.5, 0.5), uniform(-0.5, 0.5), uniform(-0.5, 0.5),
+                                             uniform(-0.5, 0.5), uniform(-0.5, 0.5), uniform(-0.5, 0.5)))
+            bias[i] = uniform(-0.2, 0.2)
 
     def save(self):
         ensure_dir(self.path)
         tmp = self.path + ".tmp"
+        if self.binary:
+            self._save_bin(tmp)
+        else:
+            # JSON stays the default: other fleet tools share fleet_state.json
+            self._save_json(tmp)
+        os.replace(tmp, self.path)
+
+    def _snapshot(self) -> "FleetState":
+        snap = object.__new__(FleetState)
+        snap.path, snap.size, snap.seed, snap.committee_size = self.path, self.size, self.seed, self.committee_size
+        snap.binary = self.binary
+        for name in _BIN_COLUMNS:
+            setattr(snap, name, getattr(self, name)[:])
+        return snap
+
+    def save_async(self):
+        with self._cv:
+            if self._pending is not None or self._writing:
+                self._dirty = True
+                return
+            self._pending = self._snapshot()
+            self._dirty = False
+            self._start_writer()
+
+    def _start_writer(self):
+        # caller holds self._cv
+        _flush_at_exit.add(self)
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="fleet-save", daemon=True)
+            self._writer.start()
+        self._cv.notify_all()
+
+    def _write_loop(self):
+        # exits as soon as nothing is queued, so the thread only keeps the
+        # fleet alive while a snapshot is pending or being written
+        while True:
+            with self._cv:
+                if self._pending is None:
+                    self._writer = None
+                    return
+                snap, self._pending = self._pending, None
+                self._writing = True
+            try:
+                snap.save()
+                failed = False
+            except Exception:
+                # left to flush(), which retries (and raises) in the caller's thread
+                failed = True
+            with self._cv:
+                self._dirty = self._dirty or failed
+                self._writing = False
+                self._cv.notify_all()
+
+    def flush(self):
+        with self._cv:
+            while self._pending is not None or self._writing:
+                self._cv.wait()
+            writer = self._writer
+            dirty, self._dirty = self._dirty, False
+        if writer is not None:
+            writer.join()  # idle by now; let it exit and release the fleet
+        if dirty:
+            self.save()
+
+    def _save_bin(self, tmp: str):
+        header = {
+            "version": 2,
+            "size": self.size,
+            "seed": self.seed,
+            "committee_size": self.committee_size,
+            "byteorder": sys.byteorder,
+        }
+        with open(tmp, "wb") as f:
+            f.write(_BIN_MAGIC)
+            f.write(json.dumps(header).encode("utf-8") + b"\n")
+            for name in _BIN_COLUMNS:
+                getattr(self, name).tofile(f)
+
+    def _load_bin(self, raw: bytes):
+        nl = raw.index(b"\n", len(_BIN_MAGIC))
+        header = json.loads(raw[len(_BIN_MAGIC):nl])
+        self.size = int(header["size"])
+        self.seed = int(header.get("seed", self.seed))
+        self.committee_size = int(header.get("committee_size", self.committee_size))
+        self._alloc(0)
+        pos = nl + 1
+        for name in _BIN_COLUMNS:
+            col = getattr(self, name)
+            n = self.size * (N_WEIGHTS if name == "W" else 1) * col.itemsize
+            col.frombytes(raw[pos:pos + n])
+            pos += n
+            if len(col) * col.itemsize != n:  # truncated snapshot
+                self._init()
+                return
+            if header.get("byteorder", sys.byteorder) != sys.byteorder:
+                col.byteswap()
+
+    def _save_json(self, tmp: str):
+        W = self.W
+        bots = []
+        for i, (role, bias, score, acc, rej, qua, mined, fees, sub) in enumerate(zip(
+                self.role_id, self.bias, self.score, self.accepted, self.rejected, self.quarantined,
+                self.mined_blocks, self.earned_fees, self.earned_subsidy)):
+            o = i * N_WEIGHTS
+            bots.append({
+                "bot_id": i,
+                "name": f"{ROLES[role]}-{i:05d}",
+                "role": ROLES[role],
+                "genome": {
+                    "w_fee": W[o], "w_amount": W[o + 1], "w_outputs": W[o + 2],
+                    "w_entropy": W[o + 3], "w_memo": W[o + 4], "w_burst": W[o + 5],
+                    "bias": bias,
+                },
+                "score": score,
+                "accepted": acc,
+                "rejected": rej,
+                "quarantined": qua,
+                "mined_blocks": mined,
+                "earned_fees": fees,
+                "earned_subsidy": sub,
+            })
         obj = {
             "version": 1,
             "size": self.size,
             "seed": self.seed,
             "committee_size": self.committee_size,
-            "bots": [{
-                "bot_id": b.bot_id,
-                "name": b.name,
-                "role": b.role,
-                "genome": b.genome.to_dict(),
-                "score": b.score,
-                "accepted": b.accepted,
-                "rejected": b.rejected,
-                "quarantined": b.quarantined,
-                "mined_blocks": b.mined_blocks,
-                "earned_fees": b.earned_fees,
-                "earned_subsidy": b.earned_subsidy,
-            } for b in self.bots],
+            "bots": bots,
         }
         with open(tmp, "w", encoding="utf-8") as f:
             f.write(json.dumps(obj, ensure_ascii=False))
-        os.replace(tmp, self.path)
 
     def load(self):
-        with open(self.path, "r", encoding="utf-8") as f:
-            obj = json.loads(f.read())
+        with open(self.path, "rb") as f:
+            raw = f.read()
+        if raw.startswith(_BIN_MAGIC):
+            self._load_bin(raw)
+            return
+        obj = json.loads(raw)
         self.size = int(obj.get("size", self.size))
         self.seed = int(obj.get("seed", self.seed))
         self.committee_size = int(obj.get("committee_size", self.committee_size))
-        self.bots = []
-        for bd in obj.get("bots", []):
-            g = BotGenome.from_dict(bd["genome"])
-            b = AIBot(
-                bot_id=int(bd["bot_id"]),
-                name=str(bd["name"]),
-                role=str(bd["role"]),
-                genome=g,
-                score=float(bd.get("score", 0.0)),
-                accepted=int(bd.get("accepted", 0)),
-                rejected=int(bd.get("rejected", 0)),
-                quarantined=int(bd.get("quarantined", 0)),
-                mined_blocks=int(bd.get("mined_blocks", 0)),
-                earned_fees=int(bd.get("earned_fees", 0)),
-                earned_subsidy=int(bd.get("earned_subsidy", 0)),
-            )
-            self.bots.append(b)
-        if len(self.bots) != self.size:
+        bots = obj.get("bots", [])
+        if len(bots) != self.size:
             self._init()
+            return
+        self._alloc(self.size)
+        W, role_id = self.W, self.role_id
+        for i, bd in enumerate(bots):
+            g = bd["genome"]
+            o = i * N_WEIGHTS
+            W[o:o + N_WEIGHTS] = array("d", (float(g["w_fee"]), float(g["w_amount"]), float(g["w_outputs"]),
+                                             float(g["w_entropy"]), float(g["w_memo"]), float(g["w_burst"])))
+            self.bias[i] = float(g["bias"])
+            role_id[i] = ROLES.index(str(bd["role"]))
+            self.score[i] = float(bd.get("score", 0.0))
+            for name in COUNTERS:
+                getattr(self, name)[i] = int(bd.get(name, 0))
+
+    def bot(self, i: int) -> AIBot:
+        return AIBot(self, i)
+
+    def name_of(self, i: int) -> str:
+        return f"{ROLES[self.role_id[i]]}-{i:05d}"
+
+    def committee_ids(self) -> List[int]:
+        # The draw is a pure function of the 10s epoch, so it is made once per
+        # epoch instead of reseeding a generator for every transaction.
+        key = (self.seed + now_ts() // 10, self.size, self.committee_size)
+        if key != self._committee_key:
+            r = random.Random(key[0])  # changes slowly
+            k = min(self.committee_size, self.size)
+            self._committee_ids = r.sample(range(self.size), k=k)
+            self._committee_key = key
+        return list(self._committee_ids)
 
     def committee(self) -> List[AIBot]:
-        import random
-        r = random.Random(self.seed + now_ts() // 10)  # changes slowly
-        k = min(self.committee_size, len(self.bots))
-        return [self.bots[i] for i in r.sample(range(len(self.bots)), k=k)]
+        return [AIBot(self, i) for i in self.committee_ids()]
+
+    def min_fee(self, i: int, x: Tuple[float, float, float, float, float, float]) -> int:
+        o = i * N_WEIGHTS
+        W = self.W
+        z = (W[o] * x[0] + W[o + 1] * x[1] + W[o + 2] * x[2] + W[o + 3] * x[3]
+             + W[o + 4] * x[4] + W[o + 5] * x[5] + self.bias[i])
+        mult = 1.0 + max(0.0, z)
+        base = 1000
+        return int(base * mult)
+
+    def committee_vote(
+        self,
+        ids: List[int],
+        x: Tuple[float, float, float, float, float, float],
+        guardian_score: float,
+        threshold: float,
+        offered_fee: int,
+        need_fees: bool = True,
+    ) -> Tuple[Dict[str, int], Dict[str, int], List[int], int]:
+        """
+        AIBot.policy_min_fee + AIBot.decide for every member, read straight
+        from the arrays. Returns (votes, reasons, min_fee_sugs, leader_id).
+
+        Every policy floor is at least 1000, so an offer below that is a
+        unanimous fee denial; unless the caller wants the suggestions, the
+        members are not evaluated at all.
+        """
+        leader = max(ids, key=self.score.__getitem__)
+        if offered_fee < 1000 and not need_fees:
+            n = len(ids)
+            return ({"allow": 0, "deny": n, "quarantine": 0},
+                    {"fee_too_low_for_policy": n}, [], leader)
+        x0, x1, x2, x3, x4, x5 = x
+        W, bias, role_id = self.W, self.bias, self.role_id
+        high_risk = guardian_score >= threshold
+        votes = {"allow": 0, "deny": 0, "quarantine": 0}
+        reasons: Dict[str, int] = {}
+        min_fee_sugs: List[int] = []
+        for i in ids:
+            o = i * N_WEIGHTS
+            z = (W[o] * x0 + W[o + 1] * x1 + W[o + 2] * x2 + W[o + 3] * x3
+                 + W[o + 4] * x4 + W[o + 5] * x5 + bias[i])
+            min_fee = int(1000 * (1.0 + z)) if z > 0.0 else 1000
+            min_fee_sugs.append(min_fee)
+            if offered_fee < min_fee:
+                decision, reason = "deny", "fee_too_low_for_policy"
+            elif high_risk:
+                decision = "quarantine" if role_id[i] < 2 else "deny"  # Sentinel/Auditor
+                reason = "guardian_high_risk"
+            else:
+                decision, reason = "allow", "ok"
+            votes[decision] += 1
+            reasons[reason] = reasons.get(reason, 0) + 1
+        return votes, reasons, min_fee_sugs, leader
 
     def miner_of_round(self) -> AIBot:
         c = self.committee()
         return max(c, key=lambda b: b.score)
 
-    def update_score(self, bot: AIBot):
-        reward = (bot.earned_fees / 1e6) + (bot.earned_subsidy / 1e7)
-        penalty = (bot.rejected * 0.01) + (bot.quarantined * 0.005)
-        bot.score = max(0.0, reward - penalty)
+    def update_score(self, i: int):
+        reward = (self.earned_fees[i] / 1e6) + (self.earned_subsidy[i] / 1e7)
+        penalty = (self.rejected[i] * 0.01) + (self.quarantined[i] * 0.005)
+        self.score[i] = max(0.0, reward - penalty)
 
 # ----------------------------
 # Marketplace: leases + payouts
@@ -320,9 +599,15 @@ class RentalMarket:
     A simple leasing registry:
       - leases: renter leases a bot for some share (0..1)
       - payouts: on each mined block, allocate rewards to renters of the miner bot
+
+    Mutations mark the state dirty and rewrite the file at most once per
+    save_interval_sec; flush() (also run at exit) writes any pending change.
     """
-    def __init__(self, path: str):
+    def __init__(self, path: str, save_interval_sec: float = 2.0):
         self.path = path
+        self.save_interval_sec = float(save_interval_sec)
+        self._dirty = False
+        self._last_save = 0.0
         self.state: Dict[str, Any] = {
             "version": 1,
             "leases": {},     # lease_id -> {renter_id, bot_id, share_bps, expires_ts}
@@ -333,6 +618,7 @@ class RentalMarket:
             self.load()
         else:
             self.save()
+        _flush_at_exit.add(self)
 
     def save(self):
         ensure_dir(self.path)
@@ -340,6 +626,17 @@ class RentalMarket:
         with open(tmp, "w", encoding="utf-8") as f:
             f.write(json.dumps(self.state, ensure_ascii=False))
         os.replace(tmp, self.path)
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+    def _mark_dirty(self):
+        self._dirty = True
+        if time.monotonic() - self._last_save >= self.save_interval_sec:
+            self.save()
+
+    def flush(self):
+        if self._dirty:
+            self.save()
 
     def load(self):
         with open(self.path, "r", encoding="utf-8") as f:
@@ -359,7 +656,7 @@ class RentalMarket:
         }
         key = str(bot_id)
         self.state["bot_leases"].setdefault(key, []).append(lease_id)
-        self.save()
+        self._mark_dirty()
         return lease_id
 
     def close_lease(self, lease_id: str) -> bool:
@@ -370,19 +667,29 @@ class RentalMarket:
         self.state["leases"].pop(lease_id, None)
         if bot_id in self.state["bot_leases"]:
             self.state["bot_leases"][bot_id] = [x for x in self.state["bot_leases"][bot_id] if x != lease_id]
-        self.save()
+        self._mark_dirty()
         return True
 
     def _active_leases_for_bot(self, bot_id: int) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Live leases of a bot, in creation order. Expired or closed ids are
+        dropped from bot_leases as they are found (the lease records stay in
+        "leases"), so the scan only ever covers leases that were live last time.
+        """
         key = str(bot_id)
+        ids = self.state["bot_leases"].get(key)
+        if not ids:
+            return []
+        leases = self.state["leases"]
+        now = now_ts()
         out = []
-        for lid in self.state["bot_leases"].get(key, []):
-            lease = self.state["leases"].get(lid)
-            if not lease:
-                continue
-            if int(lease["expires_ts"]) <= now_ts():
-                continue
-            out.append((lid, lease))
+        for lid in ids:
+            lease = leases.get(lid)
+            if lease and int(lease["expires_ts"]) > now:
+                out.append((lid, lease))
+        if len(out) != len(ids):
+            self.state["bot_leases"][key] = [lid for lid, _ in out]
+            self._dirty = True
         return out
 
     def allocate_reward(self, bot_id: int, total_reward: int, renters_pool_bps: int) -> Dict[str, Any]:
@@ -427,7 +734,7 @@ class RentalMarket:
             self.state["balances"][renter] = int(self.state["balances"].get(renter, 0)) + int(amt)
             distributed[renter] = distributed.get(renter, 0) + int(amt)
 
-        self.save()
+        self._mark_dirty()
         return {
             "bot_id": bot_id,
             "total_reward": int(total_reward),
@@ -458,21 +765,24 @@ def tx_sender(tx: "aichain.Transaction") -> str:
         return ""
     return tx.vin[0].from_addr or ""
 
-def tx_guardian_dict(tx: "aichain.Transaction", burst_score: float) -> Dict[str, Any]:
-    amount = float(sum(o.amount for o in tx.vout))
-    fee = float(tx.fee)
-    outputs = int(len(tx.vout))
-    memo = str(tx.memo or "")
+def tx_features(tx: "aichain.Transaction", burst_score: float, ts: int) -> "aiguardian.TxFeatures":
+    """
+    aiguardian.extract_features for a chain tx, built in one pass over the
+    outputs without the intermediate guardian dict.
+    """
+    amount = 0
+    for o in tx.vout:
+        amount += o.amount
     to_addr = tx.vout[0].to_addr if tx.vout else ""
-    return {
-        "amount": amount,
-        "fee": fee,
-        "outputs": outputs,
-        "memo": memo,
-        "to_addr": to_addr,
-        "burst_score": float(burst_score),
-        "timestamp": int(aichain.now_ts()),
-    }
+    return aiguardian.TxFeatures(
+        amount=float(amount),
+        fee=float(tx.fee),
+        outputs=len(tx.vout),
+        memo_len=len(str(tx.memo or "")),
+        addr_entropy=aiguardian.shannon_entropy(str(to_addr)),
+        burst_score=float(burst_score),
+        hour=(ts // 3600) % 24 if ts > 0 else 0,
+    )
 
 def install_market_patch(
     guardian_model_path: str,
@@ -484,19 +794,31 @@ def install_market_patch(
     privacy_mode: str,  # "receipt_only" or "reveal_to_sender"
     log_path: Optional[str] = None,
 ) -> Tuple[bool, str]:
-    model = aiguardian.LogisticModel.load(guardian_model_path)
-    guardian = aiguardian.Guardian(model, threshold=threshold)
+    guardian: Optional[aiguardian.Guardian] = None
+
+    def _guardian() -> aiguardian.Guardian:
+        # The model file is only read once a transaction actually needs scoring.
+        nonlocal guardian
+        if guardian is None:
+            model = aiguardian.LogisticModel.load(guardian_model_path)
+            guardian = aiguardian.Guardian(model, threshold=threshold)
+        return guardian
 
     original_add = aichain.ChainDB.add_tx_to_mempool
     original_build_tpl = aichain.ChainDB.build_block_template
     original_submit = aichain.ChainDB.submit_block
 
+    # one append handle for the life of the patch; flushed per block and at exit
+    log_fh = None
+    if log_path:
+        ensure_dir(log_path)
+        log_fh = open(log_path, "a", encoding="utf-8", buffering=1 << 16)
+        atexit.register(log_fh.close)
+
     def _log(obj: Dict[str, Any]):
-        if not log_path:
+        if log_fh is None:
             return
-        ensure_dir(log_path)
-        with open(log_path, "a", encoding="utf-8") as f:
-            f.write(json.dumps(obj, ensure_ascii=False, sort_keys=True) + "\n")
+        log_fh.write(json.dumps(obj, ensure_ascii=False, sort_keys=True) + "\n")
 
     def guarded_add(self: "aichain.ChainDB", tx: "aichain.Transaction"):
         if not hasattr(self, "quarantine"):
@@ -505,29 +827,31 @@ def install_market_patch(
         if len(tx.vin) == 1 and tx.vin[0].from_addr == "COINBASE":
             return original_add(self, tx)
 
+        txid = tx.txid()
         ts = now_ts()
         sender = tx_sender(tx)
         bscore = burst.observe(sender, ts)
 
-        txd = tx_guardian_dict(tx, burst_score=bscore)
-        feats = aiguardian.extract_features(txd)
-        gscore = guardian.score(txd)
-
-        committee = fleet.committee()
-        votes = {"allow": 0, "deny": 0, "quarantine": 0}
-        reasons: Dict[str, int] = {}
-        min_fee_sugs: List[int] = []
+        feats = tx_features(tx, bscore, ts)
+        gscore = _guardian().model.predict_proba(feats.to_vector())
 
-        for bot in committee:
-            min_fee = bot.policy_min_fee(feats)
-            min_fee_sugs.append(min_fee)
-            decision, reason = bot.decide(gscore, threshold, min_fee, int(tx.fee))
-            votes[decision] += 1
-            reasons[reason] = reasons.get(reason, 0) + 1
+        votes, reasons, min_fee_sugs, leader = fleet.committee_vote(
+            fleet.committee_ids(), policy_inputs(feats), gscore, threshold, int(tx.fee),
+            need_fees=(privacy_mode == "reveal_to_sender"))
 
-        decision = max(votes.items(), key=lambda kv: kv[1])[0]
-        top_reason = max(reasons.items(), key=lambda kv: kv[1])[0] if reasons else "ok"
-        leader = max(committee, key=lambda b: b.score)
+        # Plurality with ties going to the earlier label (allow, deny,
+        # quarantine; reasons in first-seen order), as max() over the dicts did.
+        n_allow, n_deny, n_quar = votes["allow"], votes["deny"], votes["quarantine"]
+        if n_allow >= n_deny and n_allow >= n_quar:
+            decision = "allow"
+        elif n_deny >= n_quar:
+            decision = "deny"
+        else:
+            decision = "quarantine"
+        top_reason, top_n = "ok", 0
+        for reason, n in reasons.items():
+            if n > top_n:
+                top_reason, top_n = reason, n
 
         min_fee_sugs.sort()
         recommended_fee = min_fee_sugs[len(min_fee_sugs) // 2] if min_fee_sugs else 1000
@@ -535,14 +859,14 @@ def install_market_patch(
         if decision == "allow":
             ok, out = original_add(self, tx)
             if ok:
-                leader.accepted += 1
+                fleet.accepted[leader] += 1
             else:
-                leader.rejected += 1
+                fleet.rejected[leader] += 1
             fleet.update_score(leader)
-            fleet.save()
+            fleet.save_async()
             _log({
-                "ts": ts, "action": "allow", "txid": tx.txid(),
-                "leader": leader.name, "votes": votes,
+                "ts": ts, "action": "allow", "txid": txid,
+                "leader": fleet.name_of(leader), "votes": votes,
                 "guardian_score": float(gscore), "threshold": float(threshold),
                 "burst_score": float(bscore),
             })
@@ -550,7 +874,7 @@ def install_market_patch(
 
         # Privacy-preserving rejection: return only receipt (no reasons)
         receipt = RejectionReceipt(
-            txid=tx.txid(),
+            txid=txid,
             ts=ts,
             reason_code=top_reason,
             score_bucket=bucket_score(float(gscore)),
@@ -560,19 +884,19 @@ def install_market_patch(
 
         # Optionally store tx to quarantine without leaking reason
         if decision == "quarantine":
-            self.quarantine[tx.txid()] = tx.to_dict()  # type: ignore[attr-defined]
-            leader.quarantined += 1
+            self.quarantine[txid] = tx.to_dict()  # type: ignore[attr-defined]
+            fleet.quarantined[leader] += 1
         else:
-            leader.rejected += 1
+            fleet.rejected[leader] += 1
 
         fleet.update_score(leader)
-        fleet.save()
+        fleet.save_async()
 
         # In "reveal_to_sender", we return a sender-only “hint” bundle (still not public log)
         if privacy_mode == "reveal_to_sender":
             packet["sender_notice"] = {
                 "recommended_fee": int(recommended_fee),
-                "score_bucket": bucket_score(float(gscore)),
+                "score_bucket": receipt.score_bucket,
                 "how_to_reduce_penalty": [
                     "Reduce ráfagas (burst). Espera entre transacciones.",
                     "Sube el fee (si es muy bajo) y evita patrones repetitivos.",
@@ -585,8 +909,8 @@ def install_market_patch(
         _log({
             "ts": ts,
             "action": packet["status"],
-            "txid": tx.txid(),
-            "leader": leader.name,
+            "txid": txid,
+            "leader": fleet.name_of(leader),
             "votes": votes,
             "receipt_commitment": packet["receipt_commitment"],
             "receipt_proof": packet["receipt_proof"],
@@ -610,38 +934,38 @@ def install_market_patch(
         fees = sum(t.fee for t in blk.txs[1:])
         subsidy = max(0, paid - fees)
 
-        bot = None
+        bid = None
         if "-" in miner_addr:
             try:
                 bid = int(miner_addr.split("-")[-1])
-                if 0 <= bid < len(fleet.bots):
-                    bot = fleet.bots[bid]
+                if not 0 <= bid < fleet.size:
+                    bid = None
             except Exception:
-                bot = None
-        if bot is None:
-            for b in fleet.bots:
-                if b.name == miner_addr:
-                    bot = b
+                bid = None
+        if bid is None:
+            for i in range(fleet.size):
+                if fleet.name_of(i) == miner_addr:
+                    bid = i
                     break
 
-        if bot:
-            bot.mined_blocks += 1
-            bot.earned_fees += int(fees)
-            bot.earned_subsidy += int(subsidy)
-            fleet.update_score(bot)
-            fleet.save()
+        if bid is not None:
+            fleet.mined_blocks[bid] += 1
+            fleet.earned_fees[bid] += int(fees)
+            fleet.earned_subsidy[bid] += int(subsidy)
+            fleet.update_score(bid)
+            fleet.save_async()
 
             # Allocate rewards to renters
             alloc = market.allocate_reward(
-                bot_id=bot.bot_id,
+                bot_id=bid,
                 total_reward=int(paid),
                 renters_pool_bps=renters_pool_bps,
             )
             _log({
                 "ts": now_ts(),
                 "action": "reward_allocate",
-                "miner_bot": bot.name,
-                "miner_bot_id": bot.bot_id,
+                "miner_bot": fleet.name_of(bid),
+                "miner_bot_id": bid,
                 "paid": int(paid),
                 "fees": int(fees),
                 "subsidy": int(subsidy),
@@ -649,6 +973,8 @@ def install_market_patch(
                 "allocation": alloc,
             })
 
+        if log_fh is not None:
+            log_fh.flush()
         return (ok, why)
 
     # install patches
@@ -723,7 +1049,7 @@ def cmd_balance_renter(args, market: RentalMarket):
     print(json.dumps({"renter": args.renter, "balance": int(bal)}, indent=2, ensure_ascii=False))
 
 def cmd_stats(args, fleet: FleetState):
-    top = sorted(fleet.bots, key=lambda b: b.score, reverse=True)[: args.top]
+    top = [fleet.bot(i) for i in sorted(range(fleet.size), key=fleet.score.__getitem__, reverse=True)[: args.top]]
     rows = []
     for b in top:
         rows.append({
@@ -739,14 +1065,19 @@ def cmd_stats(args, fleet: FleetState):
         })
     print(json.dumps({"fleet_size": fleet.size, "top": rows}, indent=2, ensure_ascii=False))
 
+# Subcommands that touch the chain and therefore need the patched ChainDB.
+CHAIN_COMMANDS = ("send", "mine")
+
 def main():
     p = argparse.ArgumentParser(prog="aichain_aifleet_market")
     p.add_argument("--datadir", default="./aichain_data")
 
-    p.add_argument("--guardian-model", required=True)
+    p.add_argument("--guardian-model", help="required by the chain commands (send, mine)")
     p.add_argument("--threshold", type=float, default=0.7)
 
     p.add_argument("--fleet-state", default="./fleet_state.json")
+    p.add_argument("--fleet-state-format", default="json", choices=["json", "binary"],
+                   help="format written; either one is read back")
     p.add_argument("--fleet-size", type=int, default=100000)
     p.add_argument("--fleet-seed", type=int, default=1337)
     p.add_argument("--committee-size", type=int, default=21)
@@ -803,35 +1134,46 @@ def main():
     l4.set_defaults(func=lambda a, f, m: cmd_balance_renter(a, m))
 
     args = p.parse_args()
+    chain_cmd = args.cmd in CHAIN_COMMANDS
+    if chain_cmd and not args.guardian_model:
+        p.error(f"--guardian-model is required for {args.cmd}")
 
     fleet = FleetState(
         path=args.fleet_state,
         size=args.fleet_size,
         seed=args.fleet_seed,
         committee_size=args.committee_size,
+        binary=(args.fleet_state_format == "binary"),
     )
 
-    burst = BurstTracker.load(args.burst_state, args.burst_window, args.burst_max)
     market = RentalMarket(args.market_state)
 
-    ok, msg = install_market_patch(
-        guardian_model_path=args.guardian_model,
-        threshold=args.threshold,
-        fleet=fleet,
-        burst=burst,
-        market=market,
-        renters_pool_bps=args.renters_pool_bps,
-        privacy_mode=args.privacy_mode,
-        log_path=(args.log or None),
-    )
-    if not ok:
-        raise SystemExit(msg)
+    # Only send/mine go through the patched ChainDB; the burst tracker is
+    # consumed by the patch alone.
+    burst = None
+    if chain_cmd:
+        burst = BurstTracker.load(args.burst_state, args.burst_window, args.burst_max)
+        ok, msg = install_market_patch(
+            guardian_model_path=args.guardian_model,
+            threshold=args.threshold,
+            fleet=fleet,
+            burst=burst,
+            market=market,
+            renters_pool_bps=args.renters_pool_bps,
+            privacy_mode=args.privacy_mode,
+            log_path=(args.log or None),
+        )
+        if not ok:
+            raise SystemExit(msg)
 
     # Run cmd
     args.func(args, fleet, market)
 
-    # persist burst
-    burst.save(args.burst_state)
+    # persist burst + any pending fleet/market changes
+    if burst is not None:
+        burst.save(args.burst_state)
+    fleet.flush()
+    market.flush()
 
 if __name__ == "__main__":
     main()
@@ -10,16 +10,34 @@
 # Standalone entrypoint that patches runtime.
 
 import argparse
+import atexit
 import dataclasses
 import hashlib
+import heapq
 import json
 import os
 import random
+import sys
+import threading
 import time
-from typing import Any, Dict, List, Optional, Tuple
+import weakref
+from array import array
+from collections import deque
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 import aichain
-import aiguardian
+
+# Bound by install_patch: only the chain commands (send, mine) score txs, so
+# query commands never import the guardian.
+aiguardian: Any = None
+
+# Optional C JSON encoder for the state files, journal and event log
+try:
+    import orjson  # type: ignore
+
+    HAS_ORJSON = True
+except Exception:  # pragma: no cover - optional dependency
+    HAS_ORJSON = False
 
 
 # ----------------------------
@@ -33,13 +51,54 @@ def h256(data: bytes) -> str:
     return hashlib.sha256(data).hexdigest()
 
 def jcanon(obj: Any) -> bytes:
-    return json.dumps(obj, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return aichain.canonical_json(obj)
+
+def _json_bytes(obj: Any) -> bytes:
+    if HAS_ORJSON:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:  # e.g. ints wider than 64 bits
+            pass
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _log_line(obj: Dict[str, Any]) -> bytes:
+    if HAS_ORJSON:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_APPEND_NEWLINE)
+        except TypeError:
+            pass
+    return (json.dumps(obj, ensure_ascii=False, sort_keys=True) + "\n").encode("utf-8")
+
+def _payload_json(obj: Dict[str, Any]) -> str:
+    if HAS_ORJSON:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False)
+
+def _write_json(path: str, obj: Any):
+    ensure_dir(path)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_json_bytes(obj))
+    os.replace(tmp, path)
+
+def _read_json(path: str) -> Any:
+    with open(path, "rb") as f:
+        return aichain.json_loads(f.read())
 
 def ensure_dir(path: str):
     d = os.path.dirname(path)
     if d:
         os.makedirs(d, exist_ok=True)
 
+# State stores whose pending writes are flushed at exit. Held weakly so that
+# registering does not keep a store alive for the rest of the process.
+_flush_at_exit: "weakref.WeakSet[Any]" = weakref.WeakSet()
+
+@atexit.register
+def _flush_stores():
+    for store in list(_flush_at_exit):
+        store.flush()
+
 
 # ----------------------------
 # Simple privacy receipt (same idea, kept minimal here)
@@ -51,10 +110,21 @@ def bucket_score(score: float) -> str:
     if score >= 0.50: return "med"
     return "low"
 
-def make_receipt(txid: str, reason_code: str, score_bucket: str) -> Dict[str, Any]:
+def _canon_receipt(txid: str, ts: int, reason_code: str, score_bucket: str, secret: str) -> bytes:
+    """
+    jcanon of the receipt payload with the key order baked in. Only used when
+    no field needs JSON escaping (hex ids, fixed codes); anything else goes
+    through jcanon so the bytes are always identical.
+    """
+    plain = reason_code + score_bucket + secret + txid
+    if type(ts) is int and plain.isascii() and plain.isprintable() and '"' not in plain and "\\" not in plain:
+        return (f'{{"reason_code":"{reason_code}","score_bucket":"{score_bucket}",'
+                f'"secret":"{secret}","ts":{ts},"txid":"{txid}"}}').encode("ascii")
+    return jcanon({"txid": txid, "ts": ts, "reason_code": reason_code, "score_bucket": score_bucket, "secret": secret})
+
+def make_receipt(txid: str, reason_code: str, score_bucket: str, ts: Optional[int] = None) -> Dict[str, Any]:
     secret = os.urandom(16).hex()
-    payload = {"txid": txid, "ts": now_ts(), "reason_code": reason_code, "score_bucket": score_bucket, "secret": secret}
-    commitment = h256(jcanon(payload))
+    commitment = h256(_canon_receipt(txid, now_ts() if ts is None else ts, reason_code, score_bucket, secret))
     proof_stub = h256(("proof:" + commitment).encode("utf-8"))
     return {
         "txid": txid,
@@ -72,40 +142,59 @@ def make_receipt(txid: str, reason_code: str, score_bucket: str) -> Dict[str, An
 # ----------------------------
 
 class BurstTracker:
+    # observe() calls between sweeps that drop senders with no event in the window
+    SWEEP_EVERY = 1024
+
     def __init__(self, window_sec: int = 60, max_events: int = 10):
         self.window = int(window_sec)
         self.max_events = int(max_events)
-        self.events: Dict[str, List[int]] = {}
+        self.events: Dict[str, "deque[int]"] = {}
+        self._observed = 0
 
     def observe(self, sender: str, ts: int) -> float:
         if not sender:
             return 0.0
-        lst = self.events.get(sender, [])
         cutoff = ts - self.window
-        lst = [t for t in lst if t >= cutoff]
-        lst.append(ts)
-        self.events[sender] = lst
-        return float(len(lst)) / float(max(1, self.max_events))
+        self._observed += 1
+        if self._observed % self.SWEEP_EVERY == 0:
+            self.sweep(cutoff)
+        dq = self.events.get(sender)
+        if dq is None:
+            dq = self.events[sender] = deque()
+        # timestamps arrive in order, so expired ones are always at the left
+        while dq and dq[0] < cutoff:
+            dq.popleft()
+        dq.append(ts)
+        return float(len(dq)) / float(max(1, self.max_events))
+
+    def sweep(self, cutoff: int):
+        stale = [k for k, dq in self.events.items() if not dq or dq[-1] < cutoff]
+        for k in stale:
+            del self.events[k]
 
     def snapshot(self) -> Dict[str, Any]:
-        return {"window": self.window, "max_events": self.max_events, "events": self.events}
+        return {"window": self.window, "max_events": self.max_events,
+                "events": {k: list(v) for k, v in self.events.items()}}
 
     @staticmethod
     def load(path: str, window_sec: int, max_events: int) -> "BurstTracker":
         if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                obj = json.loads(f.read())
+            obj = _read_json(path)
             bt = BurstTracker(int(obj.get("window", window_sec)), int(obj.get("max_events", max_events)))
-            bt.events = {k: [int(x) for x in v] for k, v in obj.get("events", {}).items()}
+            bt.events = {k: deque(sorted(int(x) for x in v)) for k, v in obj.get("events", {}).items()}
             return bt
         return BurstTracker(window_sec, max_events)
 
-    def save(self, path: str):
-        ensure_dir(path)
-        tmp = path + ".tmp"
-        with open(tmp, "w", encoding="utf-8") as f:
-            f.write(json.dumps(self.snapshot(), ensure_ascii=False))
-        os.replace(tmp, path)
+    def save(self, path: str, now: Optional[int] = None):
+        # events older than the window can no longer count toward a burst;
+        # dropping them here keeps one-tx CLI runs, which never reach a sweep,
+        # from carrying every sender ever seen from file to file
+        cutoff = (now_ts() if now is None else now) - self.window
+        for dq in self.events.values():
+            while dq and dq[0] < cutoff:
+                dq.popleft()
+        self.sweep(cutoff)
+        _write_json(path, self.snapshot())
 
 
 # ----------------------------
@@ -113,13 +202,44 @@ class BurstTracker:
 # ----------------------------
 
 TIERS = ["Bronze", "Silver", "Gold", "Platinum"]
+ROLES = ("Sentinel", "Auditor", "Miner", "Dispatcher")
+N_WEIGHTS = 6  # w_fee, w_amount, w_outputs, w_entropy, w_memo, w_burst
+_GENOME_WEIGHTS = ("w_fee", "w_amount", "w_outputs", "w_entropy", "w_memo", "w_burst")
+COUNTERS = ("mined_blocks", "earned_fees", "earned_subsidy", "accepted", "rejected", "quarantined")
+_COLUMNS = ("W", "bias", "score", "uptime_score", "last_heartbeat_ts", "role_id", "tier_id") + COUNTERS
+_JOURNAL_COLUMNS = ("score", "tier_id", "uptime_score", "last_heartbeat_ts") + COUNTERS
+
+# Tier adjustments for spot quotes: better bots cost more -> renters pool reduced a bit
+_TIER_PENALTY_BPS = {"Bronze": 0, "Silver": 50, "Gold": 100, "Platinum": 150}
+
+# Column cache written next to each fleet snapshot: magic, one JSON header
+# line (stamped with the snapshot's mtime and size), then the raw columns in
+# _COLUMNS order. load() uses it instead of parsing the JSON while it matches.
+_CACHE_MAGIC = b"RMSLAFLEET\x01\n"
+
+# fleet journal records appended before FleetState folds them into a snapshot
+FLEET_SNAPSHOT_INTERVAL = 1000
+
+def tier_id_from_score(score: float) -> int:
+    # These cutoffs are arbitrary; tune later. Index into TIERS.
+    if score >= 5.0: return 3  # Platinum
+    if score >= 2.0: return 2  # Gold
+    if score >= 0.7: return 1  # Silver
+    return 0  # Bronze
 
 def tier_from_score(score: float) -> str:
-    # These cutoffs are arbitrary; tune later.
-    if score >= 5.0: return "Platinum"
-    if score >= 2.0: return "Gold"
-    if score >= 0.7: return "Silver"
-    return "Bronze"
+    return TIERS[tier_id_from_score(score)]
+
+def policy_inputs(feats: "aiguardian.TxFeatures") -> Tuple[float, float, float, float, float, float]:
+    # normalized once per tx; order matches the rows of FleetState.W
+    return (
+        float(feats.fee) / 1e5,
+        float(feats.amount) / 1e8,
+        float(feats.outputs) / 10.0,
+        float(feats.addr_entropy) / 5.0,
+        float(feats.memo_len) / 200.0,
+        float(feats.burst_score),
+    )
 
 @dataclasses.dataclass
 class BotGenome:
@@ -132,7 +252,11 @@ class BotGenome:
     bias: float
 
     def to_dict(self) -> Dict[str, Any]:
-        return dataclasses.asdict(self)
+        return {
+            "w_fee": self.w_fee, "w_amount": self.w_amount, "w_outputs": self.w_outputs,
+            "w_entropy": self.w_entropy, "w_memo": self.w_memo, "w_burst": self.w_burst,
+            "bias": self.bias,
+        }
 
     @staticmethod
     def from_dict(d: Dict[str, Any]) -> "BotGenome":
@@ -151,45 +275,69 @@ class BotGenome:
             bias=r.uniform(-0.2, 0.2),
         )
 
-@dataclasses.dataclass
+class _Column:
+    """Attribute of AIBot backed by the FleetState array of the same name."""
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, bot, owner=None):
+        if bot is None:
+            return self
+        return getattr(bot.fleet, self.name)[bot.bot_id]
+
+    def __set__(self, bot, value):
+        getattr(bot.fleet, self.name)[bot.bot_id] = value
+        bot.fleet._touched.add(bot.bot_id)
+
 class AIBot:
-    bot_id: int
-    name: str
-    role: str
-    genome: BotGenome
+    """View of one bot; all state lives in the FleetState arrays."""
 
-    score: float = 0.0
-    tier: str = "Bronze"
+    score = _Column()
 
     # SLA fields
-    uptime_score: float = 0.98       # 0..1
-    last_heartbeat_ts: int = 0
+    uptime_score = _Column()       # 0..1
+    last_heartbeat_ts = _Column()
+
+    mined_blocks = _Column()
+    earned_fees = _Column()
+    earned_subsidy = _Column()
+
+    accepted = _Column()
+    rejected = _Column()
+    quarantined = _Column()
 
-    mined_blocks: int = 0
-    earned_fees: int = 0
-    earned_subsidy: int = 0
+    def __init__(self, fleet: "FleetState", bot_id: int):
+        self.fleet = fleet
+        self.bot_id = bot_id
 
-    accepted: int = 0
-    rejected: int = 0
-    quarantined: int = 0
+    @property
+    def role(self) -> str:
+        return ROLES[self.fleet.role_id[self.bot_id]]
+
+    @property
+    def name(self) -> str:
+        return self.fleet.name_of(self.bot_id)
+
+    @property
+    def tier(self) -> str:
+        return TIERS[self.fleet.tier_id[self.bot_id]]
+
+    @tier.setter
+    def tier(self, value: str):
+        self.fleet.tier_id[self.bot_id] = TIERS.index(value)
+        self.fleet._touched.add(self.bot_id)
+
+    @property
+    def genome(self) -> BotGenome:
+        i = self.bot_id
+        return BotGenome(*self.fleet.W[i * N_WEIGHTS:(i + 1) * N_WEIGHTS], bias=self.fleet.bias[i])
 
     def policy_min_fee(self, feats: "aiguardian.TxFeatures") -> int:
-        x_fee = float(feats.fee) / 1e5
-        x_amount = float(feats.amount) / 1e8
-        x_outputs = float(feats.outputs) / 10.0
-        x_entropy = float(feats.addr_entropy) / 5.0
-        x_memo = float(feats.memo_len) / 200.0
-        x_burst = float(feats.burst_score)
-
-        z = (
-            self.genome.w_fee * x_fee
-            + self.genome.w_amount * x_amount
-            + self.genome.w_outputs * x_outputs
-            + self.genome.w_entropy * x_entropy
-            + self.genome.w_memo * x_memo
-            + self.genome.w_burst * x_burst
-            + self.genome.bias
-        )
+        x = policy_inputs(feats)
+        W, o = self.fleet.W, self.bot_id * N_WEIGHTS
+        z = (W[o] * x[0] + W[o + 1] * x[1] + W[o + 2] * x[2] + W[o + 3] * x[3]
+             + W[o + 4] * x[4] + W[o + 5] * x[5] + self.fleet.bias[self.bot_id])
         mult = 1.0 + max(0.0, z)
         base = 1000
         return int(base * mult)
@@ -204,10 +352,12 @@ class AIBot:
         return ("allow", "ok")
 
     def update_tier(self):
-        self.tier = tier_from_score(self.score)
+        i = self.bot_id
+        self.fleet.tier_id[i] = tier_id_from_score(self.fleet.score[i])
+        self.fleet._touched.add(i)
 
-    def heartbeat(self):
-        self.last_heartbeat_ts = now_ts()
+    def heartbeat(self, ts: Optional[int] = None):
+        self.last_heartbeat_ts = now_ts() if ts is None else ts
 
     def degrade_uptime(self, amount: float):
         self.uptime_score = max(0.0, self.uptime_score - float(amount))
@@ -216,86 +366,437 @@ class AIBot:
         self.uptime_score = min(1.0, self.uptime_score + float(amount))
 
     def to_dict(self) -> Dict[str, Any]:
-        d = dataclasses.asdict(self)
-        d["genome"] = self.genome.to_dict()
-        return d
-
-    @staticmethod
-    def from_dict(d: Dict[str, Any]) -> "AIBot":
-        g = BotGenome.from_dict(d["genome"])
-        dd = dict(d)
-        dd["genome"] = g
-        return AIBot(**dd)
+        return self.fleet.bot_dict(self.bot_id)
 
 
 class FleetState:
+    """
+    Bots are stored column-wise: W holds N_WEIGHTS floats per bot (row-major),
+    with parallel bias/score/uptime_score/last_heartbeat_ts arrays, role and
+    tier indexes into ROLES/TIERS, and one int64 array per counter. AIBot
+    objects are views created on demand.
+
+    Persistence follows ChainDB's state.log: persist() appends the mutable
+    columns of the bots touched since the last call to <path>.log, and a full
+    JSON snapshot (tagged with the last folded journal_seq) is rewritten every
+    FLEET_SNAPSHOT_INTERVAL records by a background thread. Genomes and roles
+    never change after init, so they only live in the snapshot. flush() (also
+    run at exit) writes whatever is still pending.
+    """
+
     def __init__(self, path: str, size: int, seed: int, committee_size: int):
         self.path = path
+        self.log_path = path + ".log"
+        self.cache_path = path + ".cols"
         self.size = int(size)
         self.seed = int(seed)
         self.committee_size = int(committee_size)
-        self.bots: List[AIBot] = []
+        self._touched: Set[int] = set()
+        self._committee_key: Optional[Tuple[int, int, int]] = None
+        self._committee_ids: List[int] = []
+        self._seq = 0
+        self._log_records = 0
+        self._tail: Optional[List[bytes]] = None
+        self._pending: Optional["FleetState"] = None
+        self._writing = False
+        self._snap_failed = False
+        self._writer: Optional[threading.Thread] = None
+        self._cv = threading.Condition()
+        self._unsaved = False
         if os.path.exists(self.path):
             self.load()
         else:
+            # a fresh fleet is a pure function of (size, seed), so nothing is
+            # written until the first change reaches persist() or flush()
             self._init()
-            self.save()
+            self._unsaved = True
+
+    def _alloc(self, n: int):
+        self._policy_key: Optional[Tuple[int, ...]] = None
+        self._policy_rows: List[Tuple[Any, ...]] = []
+        self.W = array("d", bytes(8 * N_WEIGHTS * n))
+        self.bias = array("d", bytes(8 * n))
+        self.score = array("d", bytes(8 * n))
+        self.uptime_score = array("d", [0.98]) * n
+        self.last_heartbeat_ts = array("q", bytes(8 * n))
+        self.role_id = array("B", [i % len(ROLES) for i in range(n)])
+        self.tier_id = array("B", bytes(n))
+        for name in COUNTERS:
+            setattr(self, name, array("q", bytes(8 * n)))
 
     def _init(self):
-        roles = ["Sentinel", "Auditor", "Miner", "Dispatcher"]
-        self.bots = []
+        self._alloc(self.size)
+        # same per-bot seeding as BotGenome.random_init, reusing one generator
+        r = random.Random()
+        W, bias = self.W, self.bias
         for i in range(self.size):
-            role = roles[i % len(roles)]
-            name = f"{role}-{i:05d}"
-            genome = BotGenome.random_init(self.seed * 1000003 + i)
-            self.bots.append(AIBot(
-                bot_id=i,
-                name=name,
-                role=role,
-                genome=genome,
-                score=0.0,
-                tier="Bronze",
-                uptime_score=0.98,
-                last_heartbeat_ts=0,
-            ))
+            r.seed(self.seed * 1000003 + i)
+            uniform = r.uniform
+            o = i * N_WEIGHTS
+            W[o:o + N_WEIGHTS] = array("d", (uniform(-0.5, 0.5), uniform(-0.5, 0.5), uniform(-0.5, 0.5),
+                                             uniform(-0.5, 0.5), uniform(-0.5, 0.5), uniform(-0.5, 0.5)))
+            bias[i] = uniform(-0.2, 0.2)
+
+    def bot_dict(self, i: int) -> Dict[str, Any]:
+        W, o = self.W, i * N_WEIGHTS
+        role = ROLES[self.role_id[i]]
+        return {
+            "bot_id": i,
+            "name": f"{role}-{i:05d}",
+            "role": role,
+            "genome": {
+                "w_fee": W[o], "w_amount": W[o + 1], "w_outputs": W[o + 2],
+                "w_entropy": W[o + 3], "w_memo": W[o + 4], "w_burst": W[o + 5],
+                "bias": self.bias[i],
+            },
+            "score": self.score[i],
+            "tier": TIERS[self.tier_id[i]],
+            "uptime_score": self.uptime_score[i],
+            "last_heartbeat_ts": self.last_heartbeat_ts[i],
+            "mined_blocks": self.mined_blocks[i],
+            "earned_fees": self.earned_fees[i],
+            "earned_subsidy": self.earned_subsidy[i],
+            "accepted": self.accepted[i],
+            "rejected": self.rejected[i],
+            "quarantined": self.quarantined[i],
+        }
 
     def save(self):
-        ensure_dir(self.path)
-        tmp = self.path + ".tmp"
+        """Full snapshot in the caller's thread; the journal is emptied."""
+        with self._cv:
+            while self._pending is not None or self._writing:
+                self._cv.wait()
+            self._snap_failed = False
+        self._touched.clear()
+        self._tail = None
+        self._write_snapshot()
+        self._unsaved = False
+        # the snapshot's journal_seq makes stale records skip on replay,
+        # so truncating after the replace is crash-safe
+        open(self.log_path, "w", encoding="utf-8").close()
+        self._log_records = 0
+
+    def _write_snapshot(self):
         obj = {
             "version": 2,
             "size": self.size,
             "seed": self.seed,
             "committee_size": self.committee_size,
-            "bots": [b.to_dict() for b in self.bots],
+            "journal_seq": self._seq,
+            "bots": [self.bot_dict(i) for i in range(self.size)],
+        }
+        _write_json(self.path, obj)
+        self._write_cache()
+
+    def _snapshot_stamp(self) -> List[int]:
+        st = os.stat(self.path)
+        return [st.st_mtime_ns, st.st_size]
+
+    def _write_cache(self):
+        header = {
+            "snapshot": self._snapshot_stamp(),
+            "size": self.size,
+            "seed": self.seed,
+            "committee_size": self.committee_size,
+            "journal_seq": self._seq,
+            "byteorder": sys.byteorder,
         }
-        with open(tmp, "w", encoding="utf-8") as f:
-            f.write(json.dumps(obj, ensure_ascii=False))
-        os.replace(tmp, self.path)
+        tmp = self.cache_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_CACHE_MAGIC)
+            f.write(_json_bytes(header) + b"\n")
+            for name in _COLUMNS:
+                getattr(self, name).tofile(f)
+        os.replace(tmp, self.cache_path)
+
+    def _load_cache(self) -> Optional[int]:
+        """
+        Columns from the cache if it was written for the snapshot on disk;
+        returns the snapshot's journal_seq, or None to fall back to the JSON.
+        """
+        try:
+            with open(self.cache_path, "rb") as f:
+                raw = f.read()
+        except OSError:
+            return None
+        nl = raw.find(b"\n", len(_CACHE_MAGIC))
+        if not raw.startswith(_CACHE_MAGIC) or nl < 0:
+            return None
+        header = aichain.json_loads(raw[len(_CACHE_MAGIC):nl])
+        if header.get("snapshot") != self._snapshot_stamp() or header.get("byteorder") != sys.byteorder:
+            return None
+        size = int(header["size"])
+        self._alloc(0)
+        cols = [getattr(self, name) for name in _COLUMNS]
+        lengths = [size * (N_WEIGHTS if name == "W" else 1) * c.itemsize for name, c in zip(_COLUMNS, cols)]
+        pos = nl + 1
+        if len(raw) - pos != sum(lengths):
+            return None  # truncated or from another layout
+        for col, n in zip(cols, lengths):
+            col.frombytes(raw[pos:pos + n])
+            pos += n
+        self.size = size
+        self.seed = int(header["seed"])
+        self.committee_size = int(header["committee_size"])
+        return int(header["journal_seq"])
+
+    def persist(self):
+        """
+        Append the bots touched since the last call to the journal. Every
+        FLEET_SNAPSHOT_INTERVAL records a copy of the arrays is handed to a
+        background writer for a full snapshot; once it lands the journal is
+        cut down to the records appended meanwhile.
+        """
+        if self._unsaved:
+            self.save()  # first change to a fresh fleet: base snapshot, empty journal
+            return
+        self._finish_snapshot()
+        self._append_touched()
+        if self._log_records >= FLEET_SNAPSHOT_INTERVAL and self._tail is None:
+            self._start_snapshot()
+
+    def flush(self):
+        with self._cv:
+            while self._pending is not None or self._writing:
+                self._cv.wait()
+            writer = self._writer
+            failed = self._snap_failed
+        if writer is not None:
+            writer.join()  # idle by now; let it exit and release the fleet
+        if failed:
+            self.save()  # retried here so the error surfaces in the caller
+            return
+        if self._unsaved:
+            if self._touched:
+                self.save()
+            return
+        self._finish_snapshot()
+        self._append_touched()
+
+    def _append_touched(self):
+        if not self._touched:
+            return
+        cols = [getattr(self, name) for name in _JOURNAL_COLUMNS]
+        rows = [[i] + [c[i] for c in cols] for i in sorted(self._touched)]
+        self._seq += 1
+        line = _json_bytes({"s": self._seq, "b": rows}) + b"\n"
+        with open(self.log_path, "ab") as f:
+            f.write(line)
+        self._touched.clear()
+        self._log_records += 1
+        if self._tail is not None:
+            self._tail.append(line)
+
+    def _start_snapshot(self):
+        snap = object.__new__(FleetState)
+        snap.path, snap.cache_path = self.path, self.cache_path
+        snap.size, snap.seed, snap.committee_size = self.size, self.seed, self.committee_size
+        snap._seq = self._seq
+        for name in _COLUMNS:
+            setattr(snap, name, getattr(self, name)[:])
+        with self._cv:
+            self._pending = snap
+            self._snap_failed = False
+            self._tail = []
+            self._start_writer()
+
+    def _start_writer(self):
+        # caller holds self._cv
+        _flush_at_exit.add(self)
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="fleet-save", daemon=True)
+            self._writer.start()
+        self._cv.notify_all()
+
+    def _write_loop(self):
+        # exits as soon as nothing is queued, so the thread only keeps the
+        # fleet alive while a snapshot is pending or being written
+        while True:
+            with self._cv:
+                if self._pending is None:
+                    self._writer = None
+                    return
+                snap, self._pending = self._pending, None
+                self._writing = True
+            try:
+                snap._write_snapshot()
+                failed = False
+            except Exception:
+                # flush() retries in the caller's thread; the journal still has everything
+                failed = True
+            with self._cv:
+                self._snap_failed = failed
+                self._writing = False
+                self._cv.notify_all()
+
+    def _finish_snapshot(self):
+        if self._tail is None:
+            return
+        with self._cv:
+            if self._pending is not None or self._writing or self._snap_failed:
+                return
+        tail, self._tail = self._tail, None
+        tmp = self.log_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.writelines(tail)
+        os.replace(tmp, self.log_path)
+        self._log_records = len(tail)
+
+    def _read_journal(self) -> List[Tuple[int, List[List[Any]]]]:
+        records = []
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "r+b") as f:
+                data = f.read()
+                end = data.rfind(b"\n") + 1
+                if end < len(data):
+                    # torn tail from an interrupted append: cut it so the next
+                    # append starts a fresh line instead of extending it
+                    f.truncate(end)
+            for line in data[:end].splitlines():
+                try:
+                    rec = aichain.json_loads(line)
+                except ValueError:
+                    continue  # record garbled by an older torn append
+                records.append((int(rec["s"]), rec["b"]))
+        return records
 
     def load(self):
-        with open(self.path, "r", encoding="utf-8") as f:
-            obj = json.loads(f.read())
-        self.size = int(obj.get("size", self.size))
-        self.seed = int(obj.get("seed", self.seed))
-        self.committee_size = int(obj.get("committee_size", self.committee_size))
-        self.bots = [AIBot.from_dict(b) for b in obj.get("bots", [])]
-        if len(self.bots) != self.size:
-            self._init()
+        snap_seq = self._load_cache()
+        bots = None
+        if snap_seq is None:
+            obj = _read_json(self.path)
+            self.size = int(obj.get("size", self.size))
+            self.seed = int(obj.get("seed", self.seed))
+            self.committee_size = int(obj.get("committee_size", self.committee_size))
+            bots = obj.get("bots", [])
+            if "journal_seq" in obj:
+                snap_seq = int(obj["journal_seq"])
+            else:
+                # rewritten by another fleet tool sharing the path: the journal
+                # belongs to an older generation of the file, and the first
+                # change writes a snapshot of our own before appending again
+                snap_seq = 0
+                if os.path.exists(self.log_path):
+                    open(self.log_path, "w", encoding="utf-8").close()
+                self._unsaved = True
+        records = self._read_journal()
+        self._log_records = len(records)
+        self._seq = max([snap_seq] + [s for s, _ in records])
+        if bots is not None:
+            if len(bots) != self.size:
+                self._init()
+                return
+            self._load_bots(bots)
+        cols = [getattr(self, name) for name in _JOURNAL_COLUMNS]
+        for seq, rows in records:
+            if seq <= snap_seq:
+                continue  # already folded into the snapshot
+            for row in rows:
+                i = int(row[0])
+                if 0 <= i < self.size:
+                    for c, v in zip(cols, row[1:]):
+                        c[i] = v
+
+    def _load_bots(self, bots: List[Dict[str, Any]]):
+        # each column is decoded in one pass over the bot dicts and built whole
+        self._alloc(0)
+        genomes = [bd["genome"] for bd in bots]
+        self.W = array("d", [float(g[k]) for g in genomes for k in _GENOME_WEIGHTS])
+        self.bias = array("d", [float(g["bias"]) for g in genomes])
+        role_index = {role: n for n, role in enumerate(ROLES)}
+        tier_index = {tier: n for n, tier in enumerate(TIERS)}
+        self.role_id = array("B", [role_index[str(bd["role"])] for bd in bots])
+        self.tier_id = array("B", [tier_index[str(bd.get("tier", "Bronze"))] for bd in bots])
+        self.score = array("d", [float(bd.get("score", 0.0)) for bd in bots])
+        self.uptime_score = array("d", [float(bd.get("uptime_score", 0.98)) for bd in bots])
+        self.last_heartbeat_ts = array("q", [int(bd.get("last_heartbeat_ts", 0)) for bd in bots])
+        for name in COUNTERS:
+            setattr(self, name, array("q", [int(bd.get(name, 0)) for bd in bots]))
+
+    def bot(self, i: int) -> AIBot:
+        return AIBot(self, i)
+
+    def name_of(self, i: int) -> str:
+        return f"{ROLES[self.role_id[i]]}-{i:05d}"
+
+    def committee_ids(self, now: Optional[int] = None) -> List[int]:
+        if now is None:
+            now = now_ts()
+        # The draw is a pure function of the 10s epoch, so it is made once per
+        # epoch instead of reseeding a generator for every transaction.
+        key = (self.seed + now // 10, self.size, self.committee_size)
+        if key != self._committee_key:
+            r = random.Random(key[0])  # changes slowly
+            k = min(self.committee_size, self.size)
+            self._committee_ids = r.sample(range(self.size), k=k)
+            self._committee_key = key
+        return list(self._committee_ids)
 
     def committee(self) -> List[AIBot]:
-        r = random.Random(self.seed + now_ts() // 10)
-        k = min(self.committee_size, len(self.bots))
-        return [self.bots[i] for i in r.sample(range(len(self.bots)), k=k)]
+        return [AIBot(self, i) for i in self.committee_ids()]
 
-    def miner_of_round(self) -> AIBot:
-        c = self.committee()
-        return max(c, key=lambda b: b.score)
+    def _committee_policy(self, ids: List[int]) -> List[Tuple[Any, ...]]:
+        """
+        (id, w_fee, w_amount, w_outputs, w_entropy, w_memo, w_burst, bias,
+        quarantines) per member. Genomes and roles never change after load, so
+        the rows are gathered once per committee rather than re-indexed per tx.
+        """
+        key = tuple(ids)
+        if key != self._policy_key:
+            W, bias, role_id = self.W, self.bias, self.role_id
+            self._policy_rows = [
+                (i, *W[i * N_WEIGHTS:(i + 1) * N_WEIGHTS], bias[i], role_id[i] < 2)  # Sentinel/Auditor
+                for i in ids
+            ]
+            self._policy_key = key
+        return self._policy_rows
+
+    def committee_vote(
+        self,
+        ids: List[int],
+        x: Tuple[float, float, float, float, float, float],
+        guardian_score: float,
+        threshold: float,
+        offered_fee: int,
+        ts: Optional[int] = None,
+    ) -> Tuple[Dict[str, int], Dict[str, int], int]:
+        """
+        AIBot.heartbeat + policy_min_fee + decide for every member in one pass,
+        read straight from the arrays with the policy inputs x normalized once
+        by the caller. Returns (votes, reasons, leader_id).
+        """
+        x0, x1, x2, x3, x4, x5 = x
+        heartbeat = self.last_heartbeat_ts
+        hb = now_ts() if ts is None else ts
+        high_risk = guardian_score >= threshold
+        votes = {"allow": 0, "deny": 0, "quarantine": 0}
+        reasons: Dict[str, int] = {}
+        for i, w0, w1, w2, w3, w4, w5, b, quarantines in self._committee_policy(ids):
+            heartbeat[i] = hb
+            z = w0 * x0 + w1 * x1 + w2 * x2 + w3 * x3 + w4 * x4 + w5 * x5 + b
+            min_fee = int(1000 * (1.0 + z)) if z > 0.0 else 1000
+            if offered_fee < min_fee:
+                decision, reason = "deny", "fee_too_low_for_policy"
+            elif high_risk:
+                decision = "quarantine" if quarantines else "deny"
+                reason = "guardian_high_risk"
+            else:
+                decision, reason = "allow", "ok"
+            votes[decision] += 1
+            reasons[reason] = reasons.get(reason, 0) + 1
+        self._touched.update(ids)
+        leader = max(ids, key=self.score.__getitem__)
+        return votes, reasons, leader
+
+    def miner_of_round(self, now: Optional[int] = None) -> AIBot:
+        return AIBot(self, max(self.committee_ids(now), key=self.score.__getitem__))
 
     def update_score(self, bot: AIBot):
-        reward = (bot.earned_fees / 1e6) + (bot.earned_subsidy / 1e7)
-        penalty = (bot.rejected * 0.01) + (bot.quarantined * 0.005)
-        bot.score = max(0.0, reward - penalty)
+        i = bot.bot_id
+        reward = (self.earned_fees[i] / 1e6) + (self.earned_subsidy[i] / 1e7)
+        penalty = (self.rejected[i] * 0.01) + (self.quarantined[i] * 0.005)
+        self.score[i] = max(0.0, reward - penalty)
+        self._touched.add(i)
         bot.update_tier()
 
 
@@ -304,8 +805,24 @@ class FleetState:
 # ----------------------------
 
 class RentalMarket:
-    def __init__(self, path: str):
+    """
+    Leases, renter balances and the last spot quote.
+
+    Mutations mark the state dirty and rewrite the file at most once per
+    save_interval_sec; flush() (also run at exit) writes any pending change.
+
+    Lease expiries sit in a min-heap next to a live count, so counting active
+    leases only pops what expired since the last call instead of scanning
+    every lease ever written.
+    """
+    def __init__(self, path: str, save_interval_sec: float = 2.0):
         self.path = path
+        self.save_interval_sec = float(save_interval_sec)
+        self._dirty = False
+        self._last_save = 0.0
+        self._expiry_heap: List[Tuple[int, str]] = []
+        self._live_leases = 0
+        self._expired_upto = 0
         self.state: Dict[str, Any] = {
             "version": 2,
             "leases": {},
@@ -321,36 +838,74 @@ class RentalMarket:
         if os.path.exists(self.path):
             self.load()
         else:
-            self.save()
+            # defaults are written with the first change, not on open
+            self._last_save = time.monotonic()
+        self._index_expiry()
+        _flush_at_exit.add(self)
 
     def save(self):
-        ensure_dir(self.path)
-        tmp = self.path + ".tmp"
-        with open(tmp, "w", encoding="utf-8") as f:
-            f.write(json.dumps(self.state, ensure_ascii=False))
-        os.replace(tmp, self.path)
+        _write_json(self.path, self.state)
+        self._dirty = False
+        self._last_save = time.monotonic()
 
-    def load(self):
-        with open(self.path, "r", encoding="utf-8") as f:
-            self.state = json.loads(f.read())
+    def _mark_dirty(self):
+        self._dirty = True
+        if time.monotonic() - self._last_save >= self.save_interval_sec:
+            self.save()
 
-    def active_leases_count(self) -> int:
-        c = 0
-        for lid, lease in self.state["leases"].items():
-            if int(lease.get("expires_ts", 0)) > now_ts():
-                c += 1
-        return c
+    def flush(self):
+        if self._dirty:
+            self.save()
 
-    def bot_active_leases(self, bot_id: int) -> List[Tuple[str, Dict[str, Any]]]:
+    def load(self):
+        state = _read_json(self.path)
+        # one shared str per renter, so crediting a lease's renter finds its
+        # balance key by identity
+        state["balances"] = {sys.intern(k): v for k, v in state["balances"].items()}
+        for lease in state["leases"].values():
+            lease["renter_id"] = sys.intern(lease["renter_id"])
+        self.state = state
+
+    def _index_expiry(self):
+        leases = self.state["leases"]
+        self._expiry_heap = [(int(l.get("expires_ts", 0)), lid) for lid, l in leases.items()]
+        heapq.heapify(self._expiry_heap)
+        self._live_leases = len(leases)
+        self._expired_upto = 0
+
+    def active_leases_count(self, now: Optional[int] = None) -> int:
+        if now is None:
+            now = now_ts()
+        heap = self._expiry_heap
+        leases = self.state["leases"]
+        while heap and heap[0][0] <= now:
+            _, lid = heapq.heappop(heap)
+            if lid in leases:
+                self._live_leases -= 1
+        self._expired_upto = max(self._expired_upto, now)
+        return self._live_leases
+
+    def bot_active_leases(self, bot_id: int, now: Optional[int] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        Live leases of a bot, in creation order. Expired or closed ids are
+        dropped from bot_leases as they are found (the lease records stay in
+        "leases"), so the scan only ever covers leases that were live last time.
+        """
         key = str(bot_id)
+        ids = self.state["bot_leases"].get(key)
+        if not ids:
+            return []
+        leases = self.state["leases"]
+        if now is None:
+            now = now_ts()
         out = []
-        for lid in self.state["bot_leases"].get(key, []):
-            lease = self.state["leases"].get(lid)
-            if not lease:
-                continue
-            if int(lease["expires_ts"]) <= now_ts():
-                continue
-            out.append((lid, lease))
+        for lid in ids:
+            lease = leases.get(lid)
+            if lease and int(lease["expires_ts"]) > now:
+                out.append((lid, lease))
+        if len(out) != len(ids):
+            self.state["bot_leases"][key] = [lid for lid, _ in out]
+            self._dirty = True
         return out
 
     def spot_quote(self, mempool_size: int, active_leases: int, tier: str) -> Dict[str, Any]:
@@ -372,8 +927,7 @@ class RentalMarket:
 
         renters_pool = base - demand_penalty - cong_penalty
 
-        # Tier adjustments: better bots cost more -> renters pool reduced a bit
-        tier_penalty = {"Bronze": 0, "Silver": 50, "Gold": 100, "Platinum": 150}.get(tier, 0)
+        tier_penalty = _TIER_PENALTY_BPS.get(tier, 0)
         renters_pool -= tier_penalty
 
         renters_pool = max(mn, min(mx, renters_pool))
@@ -391,25 +945,31 @@ class RentalMarket:
                 "tier_penalty_bps": tier_penalty,
             }
         }
+        if quote == spot.get("last_quote"):
+            # same inputs as last time: nothing new to persist
+            return spot["last_quote"]
         spot["last_quote"] = quote
         self.state["spot"] = spot
-        self.save()
+        self._mark_dirty()
         return quote
 
     def create_lease(self, renter_id: str, bot_id: int, share_bps: int, duration_sec: int) -> str:
         share_bps = int(max(0, min(10000, share_bps)))
-        lease_id = h256(jcanon({"r": renter_id, "b": bot_id, "t": now_ts(), "n": os.urandom(8).hex()}))[:16]
-        expires = now_ts() + int(max(60, duration_sec))
+        ts = now_ts()
+        lease_id = h256(jcanon({"r": renter_id, "b": bot_id, "t": ts, "n": os.urandom(8).hex()}))[:16]
+        expires = ts + int(max(60, duration_sec))
         self.state["leases"][lease_id] = {
-            "renter_id": renter_id,
+            "renter_id": sys.intern(renter_id),
             "bot_id": int(bot_id),
             "share_bps": share_bps,
             "expires_ts": int(expires),
-            "created_ts": now_ts(),
+            "created_ts": ts,
         }
         key = str(bot_id)
         self.state["bot_leases"].setdefault(key, []).append(lease_id)
-        self.save()
+        heapq.heappush(self._expiry_heap, (int(expires), lease_id))
+        self._live_leases += 1
+        self._mark_dirty()
         return lease_id
 
     def close_lease(self, lease_id: str) -> bool:
@@ -418,17 +978,28 @@ class RentalMarket:
             return False
         bot_id = str(lease["bot_id"])
         self.state["leases"].pop(lease_id, None)
-        if bot_id in self.state["bot_leases"]:
-            self.state["bot_leases"][bot_id] = [x for x in self.state["bot_leases"][bot_id] if x != lease_id]
-        self.save()
+        if int(lease.get("expires_ts", 0)) > self._expired_upto:
+            # Still counted as live; its heap entry is skipped when popped.
+            self._live_leases -= 1
+        ids = self.state["bot_leases"].get(bot_id)
+        if ids:
+            # in place: ids are unique, and bot_active_leases may already
+            # have dropped this one if it expired
+            try:
+                ids.remove(lease_id)
+            except ValueError:
+                pass
+        self._mark_dirty()
         return True
 
-    def allocate_reward(self, bot: AIBot, total_reward: int, renters_pool_bps: int) -> Dict[str, Any]:
+    def allocate_reward(
+        self, bot: AIBot, total_reward: int, renters_pool_bps: int, now: Optional[int] = None,
+    ) -> Dict[str, Any]:
         """
         Apply SLA: renters payout multiplied by uptime_score.
         If uptime is low, renters get penalized; operator keeps remainder.
         """
-        leases = self.bot_active_leases(bot.bot_id)
+        leases = self.bot_active_leases(bot.bot_id, now)
         renters_pool = (int(total_reward) * int(renters_pool_bps)) // 10000
         operator_pool = int(total_reward) - renters_pool
 
@@ -448,20 +1019,21 @@ class RentalMarket:
         renters_pool_sla = int(renters_pool * sla_mult)
         operator_pool += (renters_pool - renters_pool_sla)
 
-        total_share = sum(int(l[1]["share_bps"]) for l in leases)
+        shares = [(lease["renter_id"], int(lease["share_bps"])) for _, lease in leases]
+        total_share = sum(sbps for _, sbps in shares)
         distributed: Dict[str, int] = {}
 
         if total_share > 0 and renters_pool_sla > 0:
-            for _, lease in leases:
-                renter = lease["renter_id"]
-                sbps = int(lease["share_bps"])
+            # Sum per renter first, then credit each balance once.
+            for renter, sbps in shares:
                 amt = (renters_pool_sla * sbps) // total_share
-                if amt <= 0:
-                    continue
-                self.state["balances"][renter] = int(self.state["balances"].get(renter, 0)) + int(amt)
-                distributed[renter] = distributed.get(renter, 0) + int(amt)
+                if amt > 0:
+                    distributed[renter] = distributed.get(renter, 0) + amt
+            balances = self.state["balances"]
+            for renter, amt in distributed.items():
+                balances[renter] = int(balances.get(renter, 0)) + amt
 
-        self.save()
+        self._mark_dirty()
         return {
             "bot_id": bot.bot_id,
             "total_reward": int(total_reward),
@@ -495,21 +1067,24 @@ def tx_sender(tx: "aichain.Transaction") -> str:
         return ""
     return tx.vin[0].from_addr or ""
 
-def tx_guardian_dict(tx: "aichain.Transaction", burst_score: float) -> Dict[str, Any]:
-    amount = float(sum(o.amount for o in tx.vout))
-    fee = float(tx.fee)
-    outputs = int(len(tx.vout))
-    memo = str(tx.memo or "")
+def tx_features(tx: "aichain.Transaction", burst_score: float, ts: int) -> "aiguardian.TxFeatures":
+    """
+    aiguardian.extract_features for a chain tx, built in one pass over the
+    outputs without the intermediate guardian dict.
+    """
+    amount = 0
+    for o in tx.vout:
+        amount += o.amount
     to_addr = tx.vout[0].to_addr if tx.vout else ""
-    return {
-        "amount": amount,
-        "fee": fee,
-        "outputs": outputs,
-        "memo": memo,
-        "to_addr": to_addr,
-        "burst_score": float(burst_score),
-        "timestamp": int(aichain.now_ts()),
-    }
+    return aiguardian.TxFeatures(
+        amount=float(amount),
+        fee=float(tx.fee),
+        outputs=len(tx.vout),
+        memo_len=len(str(tx.memo or "")),
+        addr_entropy=aiguardian.shannon_entropy(str(to_addr)),
+        burst_score=float(burst_score),
+        hour=(ts // 3600) % 24 if ts > 0 else 0,
+    )
 
 def install_patch(
     guardian_model_path: str,
@@ -520,6 +1095,9 @@ def install_patch(
     privacy_mode: str,
     log_path: Optional[str] = None,
 ) -> Tuple[bool, str]:
+    global aiguardian
+    import aiguardian
+
     model = aiguardian.LogisticModel.load(guardian_model_path)
     guardian = aiguardian.Guardian(model, threshold=threshold)
 
@@ -527,12 +1105,17 @@ def install_patch(
     original_build_tpl = aichain.ChainDB.build_block_template
     original_submit = aichain.ChainDB.submit_block
 
+    # one append handle for the life of the patch; flushed per block and at exit
+    log_fh = None
+    if log_path:
+        ensure_dir(log_path)
+        log_fh = open(log_path, "ab", buffering=1 << 16)
+        atexit.register(log_fh.close)
+
     def _log(obj: Dict[str, Any]):
-        if not log_path:
+        if log_fh is None:
             return
-        ensure_dir(log_path)
-        with open(log_path, "a", encoding="utf-8") as f:
-            f.write(json.dumps(obj, ensure_ascii=False, sort_keys=True) + "\n")
+        log_fh.write(_log_line(obj))
 
     def guarded_add(self: "aichain.ChainDB", tx: "aichain.Transaction"):
         if not hasattr(self, "quarantine"):
@@ -545,23 +1128,16 @@ def install_patch(
         sender = tx_sender(tx)
         bscore = burst.observe(sender, ts)
 
-        txd = tx_guardian_dict(tx, burst_score=bscore)
-        feats = aiguardian.extract_features(txd)
-        gscore = guardian.score(txd)
+        # features are extracted once and shared by the guardian and the committee
+        feats = tx_features(tx, bscore, ts)
+        gscore = guardian.model.predict_proba(feats.to_vector())
 
-        committee = fleet.committee()
-        votes = {"allow": 0, "deny": 0, "quarantine": 0}
-        reasons: Dict[str, int] = {}
-        for bot in committee:
-            bot.heartbeat()
-            min_fee = bot.policy_min_fee(feats)
-            decision, reason = bot.decide(gscore, threshold, min_fee, int(tx.fee))
-            votes[decision] += 1
-            reasons[reason] = reasons.get(reason, 0) + 1
+        votes, reasons, leader_id = fleet.committee_vote(
+            fleet.committee_ids(ts), policy_inputs(feats), gscore, threshold, int(tx.fee), ts)
 
         decision = max(votes.items(), key=lambda kv: kv[1])[0]
         top_reason = max(reasons.items(), key=lambda kv: kv[1])[0] if reasons else "ok"
-        leader = max(committee, key=lambda b: b.score)
+        leader = fleet.bot(leader_id)
 
         if decision == "allow":
             ok, out = original_add(self, tx)
@@ -572,12 +1148,12 @@ def install_patch(
                 leader.rejected += 1
                 leader.degrade_uptime(0.0010)
             fleet.update_score(leader)
-            fleet.save()
+            fleet.persist()
             _log({"ts": ts, "action": "allow", "txid": tx.txid(), "leader": leader.name, "votes": votes})
             return (ok, out)
 
         # privacy receipt (no public reason)
-        receipt = make_receipt(tx.txid(), top_reason, bucket_score(float(gscore)))
+        receipt = make_receipt(tx.txid(), top_reason, bucket_score(float(gscore)), ts)
         packet = {
             "status": "quarantined" if decision == "quarantine" else "rejected",
             "txid": tx.txid(),
@@ -596,7 +1172,7 @@ def install_patch(
             leader.degrade_uptime(0.0015)
 
         fleet.update_score(leader)
-        fleet.save()
+        fleet.persist()
 
         if privacy_mode == "reveal_to_sender":
             # caller-only hints (not logged)
@@ -619,11 +1195,12 @@ def install_patch(
             "votes": votes,
             "receipt_commitment": packet["receipt_commitment"],
         })
-        return (False, json.dumps(packet, ensure_ascii=False))
+        return (False, _payload_json(packet))
 
     def fleet_build_template(self: "aichain.ChainDB", miner_addr: str):
-        miner = fleet.miner_of_round()
-        miner.heartbeat()
+        ts = now_ts()
+        miner = fleet.miner_of_round(ts)
+        miner.heartbeat(ts)
         return original_build_tpl(self, miner.name)
 
     def wrapped_submit(self: "aichain.ChainDB", blk: "aichain.Block"):
@@ -631,6 +1208,7 @@ def install_patch(
         if not ok:
             return (ok, why)
 
+        ts = now_ts()
         miner_addr = blk.txs[0].vout[0].to_addr if blk.txs and blk.txs[0].vout else ""
         paid = sum(o.amount for o in blk.txs[0].vout)
         fees = sum(t.fee for t in blk.txs[1:])
@@ -640,14 +1218,14 @@ def install_patch(
         if "-" in miner_addr:
             try:
                 bid = int(miner_addr.split("-")[-1])
-                if 0 <= bid < len(fleet.bots):
-                    bot = fleet.bots[bid]
+                if 0 <= bid < fleet.size:
+                    bot = fleet.bot(bid)
             except Exception:
                 bot = None
         if bot is None:
-            for b in fleet.bots:
-                if b.name == miner_addr:
-                    bot = b
+            for i in range(fleet.size):
+                if fleet.name_of(i) == miner_addr:
+                    bot = fleet.bot(i)
                     break
 
         if bot:
@@ -656,21 +1234,22 @@ def install_patch(
             bot.earned_subsidy += int(subsidy)
             bot.improve_uptime(0.0020)
             fleet.update_score(bot)
-            fleet.save()
+            fleet.persist()
 
             # Spot quote based on chain congestion + demand
             mempool_size = int(len(self.mempool))
-            active_leases = market.active_leases_count()
+            active_leases = market.active_leases_count(ts)
             quote = market.spot_quote(mempool_size=mempool_size, active_leases=active_leases, tier=bot.tier)
 
             alloc = market.allocate_reward(
                 bot=bot,
                 total_reward=int(paid),
                 renters_pool_bps=int(quote["renters_pool_bps"]),
+                now=ts,
             )
 
             _log({
-                "ts": now_ts(),
+                "ts": ts,
                 "action": "reward_allocate",
                 "miner_bot": bot.name,
                 "miner_bot_id": bot.bot_id,
@@ -683,6 +1262,8 @@ def install_patch(
                 "allocation": alloc,
             })
 
+        if log_fh is not None:
+            log_fh.flush()
         return (ok, why)
 
     aichain.ChainDB.add_tx_to_mempool = guarded_add  # type: ignore[attr-defined]
@@ -695,13 +1276,13 @@ def install_patch(
 # CLI
 # ----------------------------
 
-def cmd_init(args):
+def cmd_init(args, fleet: FleetState, market: RentalMarket):
     db = aichain.ChainDB(args.datadir)
     print("ok")
     print("height", db.height())
     print("tip", db.tip().block_hash())
 
-def cmd_send(args):
+def cmd_send(args, fleet: FleetState, market: RentalMarket):
     db = aichain.ChainDB(args.datadir)
     tx = db.make_tx(args.from_addr, args.to_addr, args.amount, args.fee, memo=args.memo)
     ok, out = db.add_tx_to_mempool(tx)
@@ -713,7 +1294,7 @@ def cmd_send(args):
     except Exception:
         print("error", out)
 
-def cmd_mine(args):
+def cmd_mine(args, fleet: FleetState, market: RentalMarket):
     db = aichain.ChainDB(args.datadir)
     tpl = db.build_block_template(args.any_miner_addr)  # ignored
     mined = db._mine_block(tpl)
@@ -727,8 +1308,8 @@ def cmd_mine(args):
     print("coinbase_to", mined.txs[0].vout[0].to_addr if mined.txs[0].vout else "")
     print("coinbase_paid", sum(o.amount for o in mined.txs[0].vout))
 
-def cmd_stats(args, fleet: FleetState):
-    top = sorted(fleet.bots, key=lambda b: b.score, reverse=True)[: args.top]
+def cmd_stats(args, fleet: FleetState, market: RentalMarket):
+    top = [fleet.bot(i) for i in sorted(range(fleet.size), key=fleet.score.__getitem__, reverse=True)[: args.top]]
     rows = []
     for b in top:
         rows.append({
@@ -746,13 +1327,13 @@ def cmd_stats(args, fleet: FleetState):
         })
     print(json.dumps({"fleet_size": fleet.size, "top": rows}, indent=2, ensure_ascii=False))
 
-def cmd_spot_quote(args, market: RentalMarket, fleet: FleetState):
+def cmd_spot_quote(args, fleet: FleetState, market: RentalMarket):
     # Quote without needing to mine: user can see current pricing conditions
     # We approximate mempool_size with user-provided number for quoting.
     quote = market.spot_quote(mempool_size=args.mempool, active_leases=market.active_leases_count(), tier=args.tier)
     print(json.dumps({"quote": quote}, indent=2, ensure_ascii=False))
 
-def cmd_lease_create(args, market: RentalMarket, fleet: FleetState):
+def cmd_lease_create(args, fleet: FleetState, market: RentalMarket):
     # Provide a quote at time of purchase
     quote = market.spot_quote(mempool_size=args.mempool, active_leases=market.active_leases_count(), tier=args.tier)
     lease_id = market.create_lease(args.renter, args.bot_id, args.share_bps, args.duration)
@@ -766,65 +1347,51 @@ def cmd_lease_create(args, market: RentalMarket, fleet: FleetState):
         "current_price_quote": quote,
     }, indent=2, ensure_ascii=False))
 
-def cmd_lease_list(args, market: RentalMarket):
+def cmd_lease_list(args, fleet: FleetState, market: RentalMarket):
     leases = market.list_leases(renter_id=(args.renter or None))
     print(json.dumps({"leases": leases}, indent=2, ensure_ascii=False))
 
-def cmd_lease_close(args, market: RentalMarket):
+def cmd_lease_close(args, fleet: FleetState, market: RentalMarket):
     ok = market.close_lease(args.lease_id)
     print(json.dumps({"ok": bool(ok), "lease_id": args.lease_id}, indent=2, ensure_ascii=False))
 
-def cmd_renter_balance(args, market: RentalMarket):
+def cmd_renter_balance(args, fleet: FleetState, market: RentalMarket):
     bal = market.balance(args.renter)
     print(json.dumps({"renter": args.renter, "balance": int(bal)}, indent=2, ensure_ascii=False))
 
 
-def main():
-    p = argparse.ArgumentParser(prog="aichain_aifleet_market_sla")
-    p.add_argument("--datadir", default="./aichain_data")
-    p.add_argument("--guardian-model", required=True)
-    p.add_argument("--threshold", type=float, default=0.7)
-
-    p.add_argument("--fleet-state", default="./fleet_state.json")
-    p.add_argument("--fleet-size", type=int, default=100000)
-    p.add_argument("--fleet-seed", type=int, default=1337)
-    p.add_argument("--committee-size", type=int, default=21)
-
-    p.add_argument("--burst-state", default="./burst_state.json")
-    p.add_argument("--burst-window", type=int, default=60)
-    p.add_argument("--burst-max", type=int, default=10)
-
-    p.add_argument("--market-state", default="./rental_state.json")
-    p.add_argument("--privacy-mode", default="receipt_only", choices=["receipt_only", "reveal_to_sender"])
-    p.add_argument("--log", default="", help="optional JSONL log")
-
-    sp = p.add_subparsers(dest="cmd", required=True)
-
+def _add_init(sp):
     s0 = sp.add_parser("init")
-    s0.set_defaults(func=lambda a, f, m: cmd_init(a))
+    s0.set_defaults(func=cmd_init)
 
+def _add_send(sp):
     s1 = sp.add_parser("send")
     s1.add_argument("from_addr")
     s1.add_argument("to_addr")
     s1.add_argument("amount", type=int)
     s1.add_argument("--fee", type=int, default=1000)
     s1.add_argument("--memo", default="")
-    s1.set_defaults(func=lambda a, f, m: cmd_send(a))
+    # the only command whose txs go through the burst tracker
+    s1.set_defaults(func=cmd_send, needs_patch=True, mutates_burst=True)
 
+def _add_mine(sp):
     s2 = sp.add_parser("mine")
     s2.add_argument("any_miner_addr", help="ignored; fleet selects miner bot")
-    s2.set_defaults(func=lambda a, f, m: cmd_mine(a))
+    s2.set_defaults(func=cmd_mine, needs_patch=True)
 
+def _add_stats(sp):
     s3 = sp.add_parser("stats")
     s3.add_argument("--top", type=int, default=20)
-    s3.set_defaults(func=lambda a, f, m: cmd_stats(a, f))
+    s3.set_defaults(func=cmd_stats)
 
-    # Spot quote & leases
+# Spot quote & leases
+def _add_spot_quote(sp):
     q = sp.add_parser("spot-quote")
     q.add_argument("--mempool", type=int, default=0)
     q.add_argument("--tier", default="Bronze", choices=TIERS)
-    q.set_defaults(func=lambda a, f, m: cmd_spot_quote(a, m, f))
+    q.set_defaults(func=cmd_spot_quote)
 
+def _add_lease_create(sp):
     l1 = sp.add_parser("lease-create")
     l1.add_argument("--renter", required=True)
     l1.add_argument("--bot-id", type=int, required=True)
@@ -832,41 +1399,115 @@ def main():
     l1.add_argument("--duration", type=int, default=3600)
     l1.add_argument("--mempool", type=int, default=0, help="for quoting at purchase time")
     l1.add_argument("--tier", default="Bronze", choices=TIERS, help="for quoting at purchase time")
-    l1.set_defaults(func=lambda a, f, m: cmd_lease_create(a, m, f))
+    l1.set_defaults(func=cmd_lease_create)
 
+def _add_lease_list(sp):
     l2 = sp.add_parser("lease-list")
     l2.add_argument("--renter", default="")
-    l2.set_defaults(func=lambda a, f, m: cmd_lease_list(a, m))
+    l2.set_defaults(func=cmd_lease_list)
 
+def _add_lease_close(sp):
     l3 = sp.add_parser("lease-close")
     l3.add_argument("--lease-id", required=True)
-    l3.set_defaults(func=lambda a, f, m: cmd_lease_close(a, m))
+    l3.set_defaults(func=cmd_lease_close)
 
+def _add_renter_balance(sp):
     l4 = sp.add_parser("renter-balance")
     l4.add_argument("--renter", required=True)
-    l4.set_defaults(func=lambda a, f, m: cmd_renter_balance(a, m))
+    l4.set_defaults(func=cmd_renter_balance)
+
+# subcommand name -> builder, in help order
+SUBCOMMANDS = {
+    "init": _add_init,
+    "send": _add_send,
+    "mine": _add_mine,
+    "stats": _add_stats,
+    "spot-quote": _add_spot_quote,
+    "lease-create": _add_lease_create,
+    "lease-list": _add_lease_list,
+    "lease-close": _add_lease_close,
+    "renter-balance": _add_renter_balance,
+}
+
+def _add_global_options(p: argparse.ArgumentParser):
+    p.add_argument("--datadir", default="./aichain_data")
+    p.add_argument("--guardian-model", help="required by the chain commands (send, mine)")
+    p.add_argument("--threshold", type=float, default=0.7)
+
+    p.add_argument("--fleet-state", default="./fleet_state.json")
+    p.add_argument("--fleet-size", type=int, default=100000)
+    p.add_argument("--fleet-seed", type=int, default=1337)
+    p.add_argument("--committee-size", type=int, default=21)
+
+    p.add_argument("--burst-state", default="./burst_state.json")
+    p.add_argument("--burst-window", type=int, default=60)
+    p.add_argument("--burst-max", type=int, default=10)
+
+    p.add_argument("--market-state", default="./rental_state.json")
+    p.add_argument("--privacy-mode", default="receipt_only", choices=["receipt_only", "reveal_to_sender"])
+    p.add_argument("--log", default="", help="optional JSONL log")
+
+def _peek_command(argv: List[str]) -> Optional[str]:
+    """
+    The subcommand named on the command line, or None for help, a bad global
+    option or anything unrecognized. The global options are consumed by a
+    parser that declares them, so "--opt=value" and flags are read exactly
+    as main() will read them.
+    """
+    peek = argparse.ArgumentParser(add_help=False, exit_on_error=False)
+    _add_global_options(peek)
+    try:
+        _, rest = peek.parse_known_args(argv)
+    except argparse.ArgumentError:
+        return None
+    for tok in rest:
+        if tok in ("-h", "--help"):
+            return None
+        if not tok.startswith("-"):
+            return tok if tok in SUBCOMMANDS else None
+    return None
+
+def main():
+    p = argparse.ArgumentParser(prog="aichain_aifleet_market_sla")
+    _add_global_options(p)
+
+    sp = p.add_subparsers(dest="cmd", required=True)
+    # only the invoked command's parser is built; help and unknown commands get all of them
+    cmd = _peek_command(sys.argv[1:])
+    for add in ([SUBCOMMANDS[cmd]] if cmd else SUBCOMMANDS.values()):
+        add(sp)
 
     args = p.parse_args()
+    needs_patch = getattr(args, "needs_patch", False)
+    if needs_patch and not args.guardian_model:
+        p.error(f"--guardian-model is required for {args.cmd}")
 
     fleet = FleetState(args.fleet_state, args.fleet_size, args.fleet_seed, args.committee_size)
-    burst = BurstTracker.load(args.burst_state, args.burst_window, args.burst_max)
     market = RentalMarket(args.market_state)
 
-    ok, msg = install_patch(
-        guardian_model_path=args.guardian_model,
-        threshold=args.threshold,
-        fleet=fleet,
-        burst=burst,
-        market=market,
-        privacy_mode=args.privacy_mode,
-        log_path=(args.log or None),
-    )
-    if not ok:
-        raise SystemExit(msg)
+    # Only send/mine go through the patched ChainDB (and so the guardian
+    # model); the burst tracker is consumed by the patch alone.
+    burst = None
+    if needs_patch:
+        burst = BurstTracker.load(args.burst_state, args.burst_window, args.burst_max)
+        ok, msg = install_patch(
+            guardian_model_path=args.guardian_model,
+            threshold=args.threshold,
+            fleet=fleet,
+            burst=burst,
+            market=market,
+            privacy_mode=args.privacy_mode,
+            log_path=(args.log or None),
+        )
+        if not ok:
+            raise SystemExit(msg)
 
     args.func(args, fleet, market)
 
-    burst.save(args.burst_state)
+    if burst is not None and getattr(args, "mutates_burst", False):
+        burst.save(args.burst_state)
+    fleet.flush()
+    market.flush()
 
 
 if __name__ == "__main__":
@@ -240,7 +240,22 @@ class ReadOnlyChainAdapter:
         try:
             with self._state_path.open("r", encoding="utf-8") as f:
                 state = json.load(f)
-            return {k: int(v) for k, v in state.get("balances", {}).items()}
+            balances = {k: int(v) for k, v in state.get("balances", {}).items()}
+            snap_height = int(state.get("height", -1))
+            log_path = self.datadir / "state.log"
+            if log_path.exists():
+                # per-block deltas appended by aichain.ChainDB since the snapshot
+                with log_path.open("r", encoding="utf-8") as f:
+                    for line in f:
+                        if not line.endswith("\n"):
+                            break  # torn tail; ChainDB cuts it on its next load
+                        try:
+                            rec = json.loads(line)
+                        except Exception:
+                            continue
+                        if int(rec.get("h", -1)) > snap_height:
+                            balances.update({k: int(v) for k, v in rec.get("d", {}).items()})
+            return balances
         except Exception:
             return {}
 
@@ -0,0 +1,33 @@
+import gc
+import json
+import weakref
+
+import pytest
+
+import aichain
+
+
+@pytest.fixture
+def guardian_model(tmp_path, monkeypatch):
+    """
+    Path to a zero-weight guardian model. The ChainDB methods that the fleet
+    and market patches replace are restored when the test ends.
+    """
+    for name in ("add_tx_to_mempool", "build_block_template", "submit_block"):
+        monkeypatch.setattr(aichain.ChainDB, name, getattr(aichain.ChainDB, name))
+    model = tmp_path / "model.json"
+    model.write_text(json.dumps({"w": [0.0] * 8}))
+    return str(model)
+
+
+@pytest.fixture
+def assert_market_flushed_weakly(tmp_path):
+    """Check that a module's exit-flush registry does not keep a RentalMarket alive."""
+    def check(module):
+        market = module.RentalMarket(str(tmp_path / "rental.json"))
+        assert market in module._flush_at_exit
+        ref = weakref.ref(market)
+        del market
+        gc.collect()
+        assert ref() is None
+    return check
@@ -0,0 +1,180 @@
+import dataclasses
+import hashlib
+import json
+
+import aichain
+
+
+def _naive_merkle(txids):
+    layer = [bytes.fromhex(t) for t in txids]
+    while len(layer) > 1:
+        if len(layer) % 2 == 1:
+            layer.append(layer[-1])
+        layer = [hashlib.sha256(layer[i] + layer[i + 1]).digest() for i in range(0, len(layer), 2)]
+    return layer[0].hex()
+
+
+def test_merkle_root_matches_pairwise_definition():
+    for n in range(1, 18):
+        txids = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(n)]
+        assert aichain.merkle_root(txids) == _naive_merkle(txids)
+
+
+def test_merkle_root_empty():
+    assert aichain.merkle_root([]) == hashlib.sha256(b"").hexdigest()
+
+
+def test_nonce_split_reassembles_header_encoding():
+    hdr = aichain.BlockHeader(
+        version=1, prev_hash="00" * 32, merkle_root="ab" * 32,
+        timestamp=1_700_000_000, height=3, bits=2, nonce=987654,
+    )
+    prefix, suffix = hdr.nonce_split()
+    assert prefix + b"987654" + suffix == aichain.canonical_json(hdr.to_dict())
+
+
+def test_mined_genesis_satisfies_pow(tmp_path):
+    db = aichain.ChainDB(str(tmp_path))
+    assert db._check_pow(db.tip().header)
+
+
+def test_v2_header_hashes_binary_encoding_and_splits_at_nonce():
+    hdr = aichain.BlockHeader(
+        version=aichain.HEADER_VERSION, prev_hash="00" * 32, merkle_root="ab" * 32,
+        timestamp=1_700_000_000, height=3, bits=2, nonce=987654,
+    )
+    prefix, suffix = hdr.nonce_split()
+    assert prefix + hdr.nonce_encoder()(987654) + suffix == hdr.ser()
+    assert hdr.hash() == hashlib.sha256(hdr.ser()).hexdigest()
+
+
+def test_v1_txid_still_hashes_canonical_json():
+    tx = aichain.Transaction(
+        version=1, vin=[aichain.TxIn(from_addr="a")], vout=[aichain.TxOut(to_addr="b", amount=5)],
+        fee=1, nonce=2, memo="m",
+    )
+    assert tx.txid() == hashlib.sha256(aichain.canonical_json(tx.to_dict())).hexdigest()
+    tx2 = dataclasses.replace(tx, version=aichain.TX_VERSION)
+    assert tx2.txid() == hashlib.sha256(tx2.ser()).hexdigest()
+
+
+def test_batch_defers_block_and_state_writes(tmp_path):
+    db = aichain.ChainDB(str(tmp_path))
+    db.bits = 1
+    with db.batch():
+        for _ in range(3):
+            ok, _why = db.submit_block(db._mine_block(db.build_block_template("m")))
+            assert ok
+        assert len((tmp_path / "blocks.jsonl").read_text().splitlines()) == 1
+    assert len((tmp_path / "blocks.jsonl").read_text().splitlines()) == 4
+    reloaded = aichain.ChainDB(str(tmp_path))
+    assert reloaded.height() == 3
+    assert reloaded.balances == db.balances
+
+
+def test_failed_block_apply_restores_touched_balances(tmp_path):
+    db = aichain.ChainDB(str(tmp_path))
+    before = dict(db.balances)
+    coinbase = aichain.Transaction(
+        version=aichain.TX_VERSION, vin=[aichain.TxIn(from_addr="COINBASE")],
+        vout=[aichain.TxOut(to_addr="fresh", amount=7)], fee=0, nonce=1,
+    )
+    ok_tx = db.make_tx("genesis", "alice", 10, 1)
+    broke_tx = db.make_tx("nobody", "alice", 10, 1)
+    blk = aichain.Block(header=db.tip().header, txs=[coinbase, ok_tx, broke_tx])
+    ok, why = db._apply_block(blk)
+    assert not ok and "insufficient funds" in why
+    assert db.balances == before
+
+
+def test_pow_target_matches_leading_zero_hex_rule():
+    for i in range(300):
+        digest = hashlib.sha256(str(i).encode()).digest()
+        digest = bytes(i % 5) + digest[i % 5:]
+        for bits in (-1, 0, 1, 2, 3, 8, 64, 65):
+            assert (digest < aichain.pow_target(bits)) == digest.hex().startswith("0" * bits)
+
+
+def test_mempool_admission_counts_pending_spend(tmp_path):
+    db = aichain.ChainDB(str(tmp_path))
+    db.bits = 1
+    bal = db.balances["genesis"]
+    ok, _ = db.add_tx_to_mempool(db.make_tx("genesis", "alice", bal - 10, 5))
+    assert ok
+    ok, why = db.add_tx_to_mempool(db.make_tx("genesis", "bob", 10, 1))
+    assert (ok, why) == (False, "insufficient funds")
+    assert db.submit_block(db._mine_block(db.build_block_template("m")))[0]
+    assert db.pending_spend == {}
+    assert db.add_tx_to_mempool(db.make_tx("genesis", "bob", 4, 1))[0]
+
+
+def test_state_log_replays_over_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(aichain, "STATE_SNAPSHOT_INTERVAL", 2)
+    db = aichain.ChainDB(str(tmp_path))
+    db.bits = 1
+    for i in range(5):
+        assert db.add_tx_to_mempool(db.make_tx("genesis", f"a{i}", 100 + i, 1))[0]
+        assert db.submit_block(db._mine_block(db.build_block_template("m")))[0]
+    log_lines = (tmp_path / "state.log").read_text().splitlines()
+    assert 0 < len(log_lines) <= 2
+    reloaded = aichain.ChainDB(str(tmp_path))
+    assert reloaded.balances == db.balances
+    assert reloaded.bits == db.bits
+
+
+def test_block_merkle_memo_tracks_tx_list(tmp_path):
+    db = aichain.ChainDB(str(tmp_path))
+    tpl = db.build_block_template("m")
+    assert tpl.merkle() == tpl.header.merkle_root
+    tpl.txs.append(db.make_tx("genesis", "x", 1, 1))
+    assert tpl.merkle() == aichain.merkle_root([t.txid() for t in tpl.txs])
+    assert tpl.merkle() != tpl.header.merkle_root
+
+
+def test_out_of_range_fields_are_rejected_before_hashing(tmp_path):
+    db = aichain.ChainDB(str(tmp_path))
+    big = db.make_tx("genesis", "alice", 2**63, 1)
+    assert db.add_tx_to_mempool(big) == (False, "output out of range")
+    assert db.add_tx_to_mempool(dataclasses.replace(big, vout=[aichain.TxOut("a", 1)], fee=2**63))[1] == "fee out of range"
+    assert db.add_tx_to_mempool(dataclasses.replace(big, vout=[aichain.TxOut("a", 1)], nonce=-1))[1] == "nonce out of range"
+    tpl = db.build_block_template("m")
+    for bad in (
+        dataclasses.replace(tpl.header, version=7),
+        dataclasses.replace(tpl.header, merkle_root="ab" * 31),
+        dataclasses.replace(tpl.header, prev_hash=tpl.header.prev_hash + "00"),
+        dataclasses.replace(tpl.header, nonce=2**64),
+    ):
+        ok, why = db._verify_block(tpl.with_header(bad))
+        assert not ok and why in ("unsupported header version", "malformed header hash", "header field out of range")
+
+
+def test_block_with_out_of_range_tx_is_rejected_not_raised(tmp_path):
+    db = aichain.ChainDB(str(tmp_path))
+    db.bits = 1
+    assert db.add_tx_to_mempool(db.make_tx("genesis", "alice", 10, 1))[0]
+    blk = db._mine_block(db.build_block_template("m"))
+    bad = dataclasses.replace(blk.txs[1], nonce=-1)
+    ok, why = db.submit_block(aichain.Block(header=blk.header, txs=[blk.txs[0], bad]))
+    assert (ok, why) == (False, "tx invalid: nonce out of range")
+    assert db.submit_block(blk)[0]
+
+
+def test_torn_state_log_tail_is_cut_before_new_appends(tmp_path):
+    db = aichain.ChainDB(str(tmp_path))
+    db.bits = 1
+    assert db.submit_block(db._mine_block(db.build_block_template("m")))[0]
+    with open(tmp_path / "state.log", "a", encoding="utf-8") as f:
+        f.write('{"h":2,"bits":1,"d":{"m":')
+    db = aichain.ChainDB(str(tmp_path))
+    db.bits = 1
+    for _ in range(2):
+        assert db.submit_block(db._mine_block(db.build_block_template("m")))[0]
+    assert (tmp_path / "state.log").read_text().endswith("}\n")
+    reloaded = aichain.ChainDB(str(tmp_path))
+    assert reloaded.height() == 3
+    assert reloaded.balances == db.balances
+
+
+def test_canonical_json_spells_floats_like_the_stdlib():
+    for obj in ({"x": 0.00001}, {"x": 1e16}, [2.5e-7, {"n": float("nan")}], {"a": 1, "b": [1.5, "s"]}):
+        assert aichain.canonical_json(obj) == json.dumps(obj, sort_keys=True, separators=(",", ":")).encode()
@@ -0,0 +1,70 @@
+import json
+import random
+
+import aichain
+import aichain_aifleet
+
+
+def _install(tmp_path, guardian_model, fleet, threshold=0.7):
+    return aichain_aifleet.install_ai_fleet_patch(guardian_model, threshold, fleet, str(tmp_path / "fleet.jsonl"))
+
+
+def test_bot_view_reads_and_writes_fleet_columns():
+    fleet = aichain_aifleet.AIFleet(8, seed=1)
+    bot = fleet.bot(6)
+    assert bot.name == "Miner-00006" and bot.role == "Miner"
+    bot.rejected += 2
+    assert fleet.rejected[6] == 2
+    g = bot.genome
+    bot.genome = g.mutate(fleet.rng, 0.1)
+    assert fleet.bot(6).genome != g
+
+
+def test_genome_helpers_draw_from_the_given_rng():
+    a = aichain_aifleet.AIFleet(3, seed=5).bot(2).genome
+    again = aichain_aifleet.AIFleet(3, seed=5)
+    b = again.bot(2).genome
+    assert a.mutate(random.Random(9), 0.1) == b.mutate(random.Random(9), 0.1)
+    assert aichain_aifleet.BotGenome.random_init(random.Random(4)) == aichain_aifleet.AIFleet(2, seed=4).bot(0).genome
+
+
+def test_evolve_replaces_worst_with_elite_children():
+    fleet = aichain_aifleet.AIFleet(40, seed=3, reproduction_interval_blocks=1, elite_fraction=0.1)
+    for i in range(40):
+        fleet.earned_fees[i] = (i + 1) * 10**6
+        fleet.rejected[i] = 900 if i == 7 else 0
+        fleet.update_reputation(i)
+    fleet.evolve_if_needed(1)
+    # bots 0-2 and 7 are the worst four; children inherit an elite's role
+    for w in (0, 1, 2, 7):
+        assert fleet.earned_fees[w] == fleet.rejected[w] == 0 and fleet.score[w] == 0.0
+    assert fleet.role_id[7] in {fleet.role_id[e] for e in (36, 37, 38, 39)}
+    assert fleet.score[39] == 40.0
+
+
+def test_patched_chain_admits_and_credits_miner_bot(tmp_path, guardian_model):
+    fleet = aichain_aifleet.AIFleet(16, seed=2)
+    assert _install(tmp_path, guardian_model, fleet)[0]
+    db = aichain.ChainDB(str(tmp_path / "data"))
+    db.bits = 1
+    ok, _ = db.add_tx_to_mempool(db.make_tx("genesis", "alice", 10, 5000))
+    assert ok
+    blk = db._mine_block(db.build_block_template("ignored"))
+    assert db.submit_block(blk)[0]
+    miner = blk.txs[0].vout[0].to_addr
+    bid = int(miner.rpartition("-")[2])
+    assert fleet.name_of(bid) == miner
+    assert fleet.mined_blocks[bid] == 1 and fleet.earned_fees[bid] == 5000
+    logged = [json.loads(line) for line in (tmp_path / "fleet.jsonl").read_text().splitlines()]
+    assert [e["action"] for e in logged] == ["mempool_admission"]
+
+
+def test_requeued_tx_is_rescored_when_the_hour_changes(tmp_path, monkeypatch, guardian_model):
+    fleet = aichain_aifleet.AIFleet(16, seed=2)
+    assert _install(tmp_path, guardian_model, fleet)[0]
+    db = aichain.ChainDB(str(tmp_path / "data"))
+    tx = db.make_tx("nobody", "alice", 10, 5000)
+    for hour in (1, 1, 2):
+        monkeypatch.setattr(aichain, "now_ts", lambda: 1_700_000_000 - 1_700_000_000 % 86400 + hour * 3600)
+        assert not db.add_tx_to_mempool(tx)[0]
+        assert tx._fleet_inputs[1] == hour
@@ -0,0 +1,106 @@
+import gc
+import json
+import weakref
+
+import aichain
+import aichain_aifleet_market as market_mod
+
+
+def _install(tmp_path, guardian_model, size=16, privacy_mode="receipt_only"):
+    fleet = market_mod.FleetState(str(tmp_path / "fleet.json"), size=size, seed=5, committee_size=5)
+    burst = market_mod.BurstTracker(60, 10)
+    market = market_mod.RentalMarket(str(tmp_path / "rental.json"))
+    ok, _ = market_mod.install_market_patch(
+        guardian_model_path=guardian_model, threshold=0.7, fleet=fleet, burst=burst, market=market,
+        renters_pool_bps=6000, privacy_mode=privacy_mode, log_path=str(tmp_path / "market.jsonl"),
+    )
+    assert ok
+    return fleet, burst, market
+
+
+def test_fleet_state_roundtrips_through_its_file(tmp_path):
+    # the format is chosen explicitly and detected on load, whatever the name
+    for name, binary in (("fleet.json", False), ("fleet.state", False), ("fleet.json.bin", True)):
+        path = str(tmp_path / name)
+        fleet = market_mod.FleetState(path, size=12, seed=3, committee_size=4, binary=binary)
+        fleet.earned_fees[9] = 2_000_000
+        fleet.update_score(9)
+        fleet.save()
+        assert (tmp_path / name).read_bytes().startswith(market_mod._BIN_MAGIC) == binary
+        again = market_mod.FleetState(path, size=12, seed=3, committee_size=4)
+        assert again.bot(9).score == 2.0 and again.bot(9).name == "Auditor-00009"
+        assert again.bot(4).genome == market_mod.BotGenome.random_init(3 * 1000003 + 4)
+
+
+def test_mined_block_pays_renters_of_the_miner_bot(tmp_path, guardian_model):
+    fleet, _, market = _install(tmp_path, guardian_model)
+    for bid in range(fleet.size):
+        market.create_lease("renter", bid, 5000, 3600)
+    db = aichain.ChainDB(str(tmp_path / "data"))
+    db.bits = 1
+    ok, _ = db.add_tx_to_mempool(db.make_tx("genesis", "alice", 10, 5000))
+    assert ok
+    blk = db._mine_block(db.build_block_template("ignored"))
+    assert db.submit_block(blk)[0]
+    bid = int(blk.txs[0].vout[0].to_addr.rpartition("-")[2])
+    assert fleet.mined_blocks[bid] == 1
+    paid = sum(o.amount for o in blk.txs[0].vout)
+    assert market.balance("renter") == paid * 6000 // 10000
+
+
+def test_rejection_returns_receipt_without_reason(tmp_path, guardian_model):
+    _install(tmp_path, guardian_model, privacy_mode="receipt_only")
+    db = aichain.ChainDB(str(tmp_path / "data"))
+    ok, out = db.add_tx_to_mempool(db.make_tx("genesis", "alice", 10, 1))
+    assert not ok
+    packet = json.loads(out)
+    assert packet["status"] == "rejected" and "sender_notice" not in packet
+    assert len(packet["receipt_commitment"]) == 64
+
+
+def test_market_writes_are_coalesced_until_flush(tmp_path):
+    path = tmp_path / "rental.json"
+    market = market_mod.RentalMarket(str(path), save_interval_sec=3600)
+    lease_id = market.create_lease("r1", 3, 2500, 600)
+    assert json.loads(path.read_text())["leases"] == {}
+    market.flush()
+    assert lease_id in market_mod.RentalMarket(str(path)).state["leases"]
+
+
+def test_expired_leases_drop_out_of_the_bot_index(tmp_path):
+    market = market_mod.RentalMarket(str(tmp_path / "rental.json"))
+    old = market.create_lease("r1", 2, 5000, 600)
+    live = market.create_lease("r2", 2, 5000, 3600)
+    market.state["leases"][old]["expires_ts"] = market_mod.now_ts() - 1
+    out = market.allocate_reward(bot_id=2, total_reward=1000, renters_pool_bps=10000)
+    assert out["distributed"] == {"r2": 1000}
+    assert market.state["bot_leases"]["2"] == [live]
+    assert old in market.state["leases"]
+
+
+def test_background_fleet_saves_catch_up_on_flush(tmp_path):
+    path = str(tmp_path / "fleet.json")
+    fleet = market_mod.FleetState(path, size=8, seed=1, committee_size=3)
+    for i in range(8):
+        fleet.accepted[i] += 1
+        fleet.save_async()
+    fleet.flush()
+    again = market_mod.FleetState(path, size=8, seed=1, committee_size=3)
+    assert list(again.accepted) == [1] * 8
+
+
+def test_rental_market_is_not_kept_alive_for_the_exit_flush(assert_market_flushed_weakly):
+    assert_market_flushed_weakly(market_mod)
+
+
+def test_flushed_fleet_state_is_not_kept_alive_by_its_writer(tmp_path):
+    fleet = market_mod.FleetState(str(tmp_path / "fleet.json"), size=8, seed=1, committee_size=3)
+    for i in range(3):
+        fleet.accepted[i] += 1
+        fleet.save_async()
+    fleet.flush()
+    assert fleet in market_mod._flush_at_exit
+    ref = weakref.ref(fleet)
+    del fleet
+    gc.collect()
+    assert ref() is None
@@ -0,0 +1,226 @@
+import gc
+import json
+import weakref
+
+import aichain
+import aichain_aifleet_market_sla as sla
+
+
+def _install(tmp_path, guardian_model, size=16, privacy_mode="receipt_only"):
+    fleet = sla.FleetState(str(tmp_path / "fleet.json"), size=size, seed=5, committee_size=5)
+    burst = sla.BurstTracker(60, 10)
+    market = sla.RentalMarket(str(tmp_path / "rental.json"))
+    ok, _ = sla.install_patch(
+        guardian_model_path=guardian_model, threshold=0.7, fleet=fleet, burst=burst, market=market,
+        privacy_mode=privacy_mode, log_path=str(tmp_path / "sla.jsonl"),
+    )
+    assert ok
+    return fleet, burst, market
+
+
+def test_low_fee_is_rejected_with_receipt_and_heartbeats(tmp_path, guardian_model):
+    fleet, _, _ = _install(tmp_path, guardian_model, privacy_mode="reveal_to_sender")
+    db = aichain.ChainDB(str(tmp_path / "data"))
+    ok, out = db.add_tx_to_mempool(db.make_tx("genesis", "alice", 10, 1))
+    assert not ok
+    packet = json.loads(out)
+    assert packet["status"] == "rejected"
+    assert packet["sender_notice"]["reason_code"] == "fee_too_low_for_policy"
+    assert sum(1 for ts in fleet.last_heartbeat_ts if ts) == 5
+
+
+def test_mined_block_pays_renters_scaled_by_uptime(tmp_path, guardian_model):
+    fleet, _, market = _install(tmp_path, guardian_model)
+    for bid in range(fleet.size):
+        market.create_lease("renter", bid, 5000, 3600)
+    db = aichain.ChainDB(str(tmp_path / "data"))
+    db.bits = 1
+    assert db.add_tx_to_mempool(db.make_tx("genesis", "alice", 10, 5000))[0]
+    blk = db._mine_block(db.build_block_template("ignored"))
+    assert db.submit_block(blk)[0]
+    bot = fleet.bot(int(blk.txs[0].vout[0].to_addr.rpartition("-")[2]))
+    assert bot.mined_blocks == 1
+    quote = market.state["spot"]["last_quote"]
+    paid = sum(o.amount for o in blk.txs[0].vout)
+    pool = paid * quote["renters_pool_bps"] // 10000
+    assert market.balance("renter") == int(pool * bot.uptime_score)
+
+
+def test_fleet_columns_roundtrip_through_json(tmp_path):
+    path = str(tmp_path / "fleet.json")
+    fleet = sla.FleetState(path, size=12, seed=3, committee_size=4)
+    bot = fleet.bot(9)
+    bot.earned_fees = 2_500_000
+    bot.degrade_uptime(0.5)
+    fleet.update_score(bot)
+    fleet.save()
+    again = sla.FleetState(path, size=12, seed=3, committee_size=4).bot(9)
+    assert (again.name, again.tier, again.score) == ("Auditor-00009", "Gold", 2.5)
+    assert abs(again.uptime_score - 0.48) < 1e-12
+    assert again.genome == sla.BotGenome.random_init(3 * 1000003 + 9)
+
+
+def test_spot_quotes_and_leases_are_written_on_flush(tmp_path):
+    path = tmp_path / "rental.json"
+    market = sla.RentalMarket(str(path), save_interval_sec=3600)
+    quote = market.spot_quote(mempool_size=1000, active_leases=0, tier="Gold")
+    lease_id = market.create_lease("r1", 3, 2500, 600)
+    assert not path.exists()
+    market.flush()
+    state = json.loads(path.read_text())
+    assert lease_id in state["leases"] and state["spot"]["last_quote"] == quote
+
+
+def test_repeated_spot_quote_is_not_rewritten(tmp_path):
+    market = sla.RentalMarket(str(tmp_path / "rental.json"), save_interval_sec=3600)
+    quote = market.spot_quote(mempool_size=1000, active_leases=3, tier="Gold")
+    market.flush()
+    assert market.spot_quote(mempool_size=1000, active_leases=3, tier="Gold") == quote
+    assert not market._dirty
+    assert market.spot_quote(mempool_size=1000, active_leases=4, tier="Gold")["renters_pool_bps"] == quote["renters_pool_bps"] - 1
+    assert market._dirty
+
+
+def test_fleet_journal_replays_over_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(sla, "FLEET_SNAPSHOT_INTERVAL", 2)
+    path = str(tmp_path / "fleet.json")
+    fleet = sla.FleetState(path, size=10, seed=2, committee_size=3)
+    for i in range(7):
+        bot = fleet.bot(i)
+        bot.accepted += i + 1
+        bot.improve_uptime(0.01)
+        fleet.update_score(bot)
+        fleet.persist()
+    fleet.flush()
+    snap_seq = json.loads((tmp_path / "fleet.json").read_text())["journal_seq"]
+    log_seqs = [json.loads(ln)["s"] for ln in (tmp_path / "fleet.json.log").read_text().splitlines()]
+    assert snap_seq >= 2 and all(s > snap_seq for s in log_seqs)
+    again = sla.FleetState(path, size=10, seed=2, committee_size=3)
+    assert [again.bot_dict(i) for i in range(10)] == [fleet.bot_dict(i) for i in range(10)]
+
+
+def test_fleet_journal_cuts_torn_tail_before_new_appends(tmp_path):
+    path = str(tmp_path / "fleet.json")
+    fleet = sla.FleetState(path, size=10, seed=2, committee_size=3)
+    for i in range(3):
+        bot = fleet.bot(i)
+        bot.accepted += i + 1
+        fleet.update_score(bot)
+        fleet.persist()
+    with open(path + ".log", "ab") as f:
+        f.write(b'{"s":99,"b":[[3,')
+    fleet = sla.FleetState(path, size=10, seed=2, committee_size=3)
+    for i in (4, 5):
+        bot = fleet.bot(i)
+        bot.earned_fees += i * 1_000_000
+        fleet.update_score(bot)
+        fleet.persist()
+    assert (tmp_path / "fleet.json.log").read_bytes().endswith(b"]]}\n")
+    again = sla.FleetState(path, size=10, seed=2, committee_size=3)
+    assert (again.score[4], again.score[5]) == (4.0, 5.0)
+    assert [again.bot_dict(i) for i in range(10)] == [fleet.bot_dict(i) for i in range(10)]
+
+
+def test_snapshot_without_journal_seq_drops_the_stale_journal(tmp_path):
+    path = tmp_path / "fleet.json"
+    fleet = sla.FleetState(str(path), size=8, seed=2, committee_size=3)
+    fleet.bot(3).accepted += 12
+    fleet.persist()
+    fleet.bot(3).rejected += 1
+    fleet.persist()
+    # another fleet tool sharing the default path rewrites it in its own format
+    obj = json.loads(path.read_text())
+    del obj["journal_seq"]
+    obj["bots"][3]["accepted"] = 100
+    path.write_text(json.dumps(obj))
+    again = sla.FleetState(str(path), size=8, seed=2, committee_size=3)
+    assert again.accepted[3] == 100 and again.rejected[3] == 0
+    assert (tmp_path / "fleet.json.log").read_bytes() == b""
+    again.bot(4).accepted += 1
+    again.persist()
+    final = sla.FleetState(str(path), size=8, seed=2, committee_size=3)
+    assert (final.accepted[3], final.accepted[4]) == (100, 1)
+
+
+def test_active_lease_count_follows_expiry_and_close(tmp_path, monkeypatch):
+    clock = [1_700_000_000]
+    monkeypatch.setattr(sla, "now_ts", lambda: clock[0])
+    market = sla.RentalMarket(str(tmp_path / "rental.json"))
+    short = market.create_lease("r1", 0, 1000, 60)
+    market.create_lease("r2", 0, 1000, 600)
+    closed = market.create_lease("r3", 1, 1000, 600)
+    assert market.active_leases_count() == 3
+    assert market.close_lease(closed)
+    clock[0] += 60
+    assert market.active_leases_count() == 1
+    assert market.close_lease(short)
+    assert market.active_leases_count() == 1
+    assert [lid for lid, _ in market.bot_active_leases(0)] == market.state["bot_leases"]["0"]
+    market.flush()
+    assert sla.RentalMarket(str(tmp_path / "rental.json")).active_leases_count() == 1
+
+
+def test_cli_peeks_the_subcommand_past_global_option_values():
+    assert sla._peek_command(["--guardian-model", "mine", "--log=x", "lease-list", "--renter", "r"]) == "lease-list"
+    assert sla._peek_command(["--fleet-size", "5", "mine", "-h"]) == "mine"
+    assert sla._peek_command(["--fleet-size", "5", "-h"]) is None
+    assert sla._peek_command(["bogus"]) is None
+    assert sla._peek_command(["--fleet-size=5", "send", "a", "b", "1", "--log", "x"]) == "send"
+    assert sla._peek_command(["--fleet-size", "lots", "mine"]) is None
+
+
+def test_fleet_loads_from_column_cache_until_snapshot_changes(tmp_path):
+    path = tmp_path / "fleet.json"
+    fleet = sla.FleetState(str(path), size=12, seed=3, committee_size=5)
+    fleet.score[4] = 1.25
+    fleet.save()
+    assert (tmp_path / "fleet.json.cols").exists()
+    again = sla.FleetState(str(path), size=12, seed=3, committee_size=5)
+    assert [again.bot_dict(i) for i in range(12)] == [fleet.bot_dict(i) for i in range(12)]
+    obj = json.loads(path.read_text())
+    obj["bots"][4]["score"] = 2.5
+    path.write_text(json.dumps(obj) + " ")
+    assert sla.FleetState(str(path), size=12, seed=3, committee_size=5).score[4] == 2.5
+
+
+def test_fresh_state_is_not_written_until_it_changes(tmp_path):
+    path = tmp_path / "fleet.json"
+    fleet = sla.FleetState(str(path), size=8, seed=3, committee_size=5)
+    market = sla.RentalMarket(str(tmp_path / "rental.json"))
+    fleet.flush()
+    market.flush()
+    assert list(tmp_path.iterdir()) == []
+    fleet.bot(2).accepted += 1
+    fleet.persist()
+    again = sla.FleetState(str(path), size=8, seed=3, committee_size=5)
+    assert [again.bot_dict(i) for i in range(8)] == [fleet.bot_dict(i) for i in range(8)]
+
+
+def test_burst_save_drops_events_outside_the_window(tmp_path):
+    path = str(tmp_path / "burst.json")
+    bt = sla.BurstTracker(60, 10)
+    bt.observe("old", 1000)
+    bt.observe("mixed", 1000)
+    bt.observe("mixed", 1100)
+    bt.save(path, now=1130)
+    again = sla.BurstTracker.load(path, 60, 10)
+    assert {k: list(v) for k, v in again.events.items()} == {"mixed": [1100]}
+    assert again.observe("mixed", 1150) == bt.observe("mixed", 1150)
+
+
+def test_rental_market_is_not_kept_alive_for_the_exit_flush(assert_market_flushed_weakly):
+    assert_market_flushed_weakly(sla)
+
+
+def test_flushed_fleet_state_is_not_kept_alive_by_its_writer(tmp_path, monkeypatch):
+    monkeypatch.setattr(sla, "FLEET_SNAPSHOT_INTERVAL", 1)
+    fleet = sla.FleetState(str(tmp_path / "fleet.json"), size=8, seed=1, committee_size=3)
+    for i in range(3):
+        fleet.bot(i).accepted += 1
+        fleet.persist()
+    fleet.flush()
+    assert fleet in sla._flush_at_exit
+    ref = weakref.ref(fleet)
+    del fleet
+    gc.collect()
+    assert ref() is None